@@ -1,17 +1,50 @@
+import asyncio
 import re
+import time
 import markdown
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
 from dotenv import load_dotenv
 import json
 
+import async_runtime
+from concurrency import Limiter, SharedStream, SingleFlight
+from instrumentation import record_cache, record_llm_usage
+from llm_cache import cache_key, create_cache
+
 # Load environment variables
 load_dotenv()
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Initialize the OpenAI client; calls run as coroutines on the shared event loop
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Completions are cached by a hash of the model, prompt and parameters
+llm_cache = create_cache()
+
+MODEL = "gpt-4o-mini"
+
+# Completions requested at once across the process, whatever they are for; keep it
+# under the OpenAI rate limit divided by the number of worker processes
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+llm_limiter = Limiter("llm", LLM_MAX_CONCURRENCY)
+
+# Summaries being generated, by cache key; viewers of the same PR share one completion
+summary_flights = SingleFlight("summary")
+_summary_streams = {}
+
+
+# The cache may be a database, so it is read and written off the event loop
+
+async def cache_get(key):
+    return await async_runtime.run_io(llm_cache.get, key)
+
+async def cache_set(key, value):
+    await async_runtime.run_io(llm_cache.set, key, value)
+
+# Minimum seconds between re-renders of a streaming summary
+SUMMARY_STREAM_INTERVAL = float(os.getenv("SUMMARY_STREAM_INTERVAL", "0.15"))
 
-def get_summary(pr_files):
+def summary_messages(pr_files):
     # Calculate total additions and deletions across all files
     total_additions = sum(file.get("additions", 0) for file in pr_files)
     total_deletions = sum(file.get("deletions", 0) for file in pr_files)
@@ -32,31 +65,126 @@ def get_summary(pr_files):
         "refactoring efforts, or improvements to code structure."
     )
 
+    return [
+        {"role": "system", "content": "You are a technical assistant summarizing pull request changes."},
+        {"role": "user", "content": input_text}
+    ]
+
+def render_summary(pr_summary):
+    # Replace newlines with <br> for proper HTML line breaks while keeping markdown format
+    cleaned_summary = pr_summary.replace('\n', '<br>')
+    return markdown.markdown(cleaned_summary)
+
+async def get_summary_text_async(pr_files):
+    """The summary as the model wrote it, in markdown."""
+    messages = summary_messages(pr_files)
+
+    # Reuse the summary of an identical prompt, e.g. the same PR viewed again
+    key = cache_key(MODEL, messages)
+    pr_summary = await cache_get(key)
+    record_cache("llm", pr_summary is not None)
+    if pr_summary is None:
+        stream = _summary_streams.get(key)
+        if stream is not None:
+            # Someone is already streaming this summary
+            pr_summary = "".join([delta async for delta in stream]).strip()
+        else:
+            pr_summary = await summary_flights.run(key, complete_summary, key, messages)
+
+    return pr_summary
+
+async def complete_summary(key, messages):
     # Use the gpt-4o-mini model to generate a detailed summary
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a technical assistant summarizing pull request changes."},
-            {"role": "user", "content": input_text}
-        ]
-    )
+    async with llm_limiter:
+        completion = await client.chat.completions.create(model=MODEL, messages=messages)
+    record_llm_usage("summary", completion)
 
     # Extract and format the generated summary
     pr_summary = completion.choices[0].message.content.strip()
+    await cache_set(key, pr_summary)
+    return pr_summary
 
-    # Replace newlines with <br> for proper HTML line breaks while keeping markdown format
-    cleaned_summary = pr_summary.replace('\n', '<br>')
-    pr_summary_html = markdown.markdown(cleaned_summary)
-    return pr_summary_html
+async def stream_summary(pr_files):
+    """
+    Streams the summary text as the model produces it.
 
-def get_scores(pr_files):
-    # Format each file entry for the prompt
-    files_info = "\n".join([
-        f"Filename: {file['filename']}\nPatch:\n{file['patch']}" 
-        for file in pr_files if 'patch' in file
-    ])
+    Shares its cache entries with get_summary_text_async: a cached summary is yielded in
+    one piece, and a streamed one is cached once it completes. Concurrent
+    streams of the same summary share one completion, each reader getting
+    every piece from the start; one being generated by get_summary_text_async is
+    awaited and yielded whole.
+
+    Yields:
+        str: Pieces of the raw markdown summary.
+    """
+    messages = summary_messages(pr_files)
+    key = cache_key(MODEL, messages)
+    pr_summary = await cache_get(key)
+    record_cache("llm", pr_summary is not None)
+    if pr_summary is not None:
+        yield pr_summary
+        return
+    if summary_flights.running(key):
+        yield await summary_flights.run(key, complete_summary, key, messages)
+        return
 
-    prompt = f"""
+    stream = _summary_streams.get(key)
+    if stream is None:
+        stream = _summary_streams[key] = SharedStream(stream_completion(key, messages))
+        stream.task.add_done_callback(lambda _: _summary_streams.pop(key, None))
+    async for delta in stream:
+        yield delta
+
+async def stream_completion(key, messages):
+    async with llm_limiter:
+        stream = await client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        parts = []
+        usage_chunk = None
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage_chunk = chunk
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+    # The final chunk carries token usage when include_usage is set
+    record_llm_usage("summary", usage_chunk)
+    await cache_set(key, "".join(parts).strip())
+
+async def stream_summary_html(pr_files, min_interval=SUMMARY_STREAM_INTERVAL):
+    """
+    Streams the summary as progressively longer HTML renderings.
+
+    The markdown is re-rendered at each line break and at most every
+    min_interval seconds in between, which keeps long summaries cheap while
+    the reader sees text within the first tokens. The last value yielded is
+    the same HTML render_summary gives for the whole summary.
+
+    Yields:
+        str: The summary rendered so far.
+    """
+    text = ""
+    rendered_length = 0
+    last_render = 0.0
+    async for delta in stream_summary(pr_files):
+        text += delta
+        now = time.monotonic()
+        if "\n" in delta or now - last_render >= min_interval:
+            yield render_summary(text.strip())
+            rendered_length = len(text)
+            last_render = now
+    if rendered_length != len(text) or not text:
+        yield render_summary(text.strip())
+
+SCORES_INSTRUCTIONS = """
     I am providing you with a list of files modified in a pull request. For each file, assess if it contains security vulnerabilities. If a security vulnerability is found, include a one-sentence description of it. Otherwise, assign an importance score based on how critical it is that the code be reviewed, on a scale of 1 to 10 (with 10 being the most critical).
 
     Use the following criteria to assign the importance score:
@@ -65,28 +193,94 @@ def get_scores(pr_files):
     - Lower importance (1-3): Files that primarily contain imports, basic configuration, or boilerplate code that is unlikely to impact core functionality.
 
     Output your results in JSON format with the following structure:
-    {{
+    {
         "files": [
-            {{
+            {
                 "filename": "name_of_the_file",
                 "status": "vulnerable" or "secure",
                 "importance_score": importance_score (integer between 1 and 10),
                 "vulnerability_summary": "brief summary if vulnerable, otherwise null"
-            }},
+            },
             ...
         ]
-    }}
+    }
+"""
+
+SCORES_PARAMS = {"max_tokens": 1500, "temperature": 0.2}
 
+# Prompt budget per scoring batch; files are capped per batch so the JSON reply fits max_tokens
+SCORES_TOKEN_BUDGET = int(os.getenv("SCORES_TOKEN_BUDGET", "12000"))
+SCORES_MAX_FILES_PER_BATCH = int(os.getenv("SCORES_MAX_FILES_PER_BATCH", "15"))
+# Scoring requests in flight at once, per process
+SCORES_MAX_WORKERS = int(os.getenv("SCORES_MAX_WORKERS", "4"))
+# Extra attempts for a single file whose reply cannot be parsed
+SCORES_RETRIES = int(os.getenv("SCORES_RETRIES", "1"))
+
+_scores_semaphore = asyncio.Semaphore(SCORES_MAX_WORKERS)
+
+
+def score_cache_key(file):
+    """Per-file cache key, so an identical patch in another PR (e.g. a backport) is a hit."""
+    return cache_key(MODEL, [SCORES_INSTRUCTIONS, file["filename"], file["patch"]], **SCORES_PARAMS)
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) used for batching prompts."""
+    return len(text) // 4 + 1
+
+
+def batch_files(files, token_budget=SCORES_TOKEN_BUDGET, max_files=SCORES_MAX_FILES_PER_BATCH):
+    """
+    Packs files into batches whose patches fit the prompt token budget.
+
+    Largest files are placed first so batches come out roughly even; a file
+    larger than the budget on its own gets a batch to itself.
+
+    Returns:
+        list: A list of batches, each a list of file dicts.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for file in sorted(files, key=lambda f: len(f["patch"]), reverse=True):
+        tokens = estimate_tokens(file["patch"])
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_files):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(file)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def request_scores(batch):
+    """
+    Sends one batch of files to the model.
+
+    Returns:
+        list or None: The per-file results, or None if the reply was not valid JSON
+            or not a list of per-file objects with a filename.
+    """
+    # Format each file entry for the prompt
+    files_info = "\n".join([
+        f"Filename: {file['filename']}\nPatch:\n{file['patch']}" 
+        for file in batch
+    ])
+
+    prompt = f"""{SCORES_INSTRUCTIONS}
     Here are the files and their diffs:
     {files_info}
     """
     
-    completion = client.chat.completions.create(
-      model="gpt-4o-mini",
-      messages=[{"role": "user", "content": prompt}],
-      max_tokens=1500,
-      temperature=0.2
-    )
+    async with _scores_semaphore, llm_limiter:
+        completion = await client.chat.completions.create(
+          model=MODEL,
+          messages=[{"role": "user", "content": prompt}],
+          **SCORES_PARAMS
+        )
+    record_llm_usage("scores", completion)
 
     # Access the content directly from the response
     result_text = completion.choices[0].message.content.strip()
@@ -98,5 +292,65 @@ def get_scores(pr_files):
         print("The response could not be parsed as JSON. Here is the raw response:")
         print(result_json)
         return None
-    
-    return result
\ No newline at end of file
+
+    files = result.get("files") if isinstance(result, dict) else None
+    if not isinstance(files, list) or not all(
+            isinstance(file, dict) and isinstance(file.get("filename"), str) for file in files):
+        print("The response did not have the expected shape. Here is the raw response:")
+        print(result_json)
+        return None
+    return files
+
+
+async def score_batch(batch, retries=SCORES_RETRIES):
+    """
+    Scores a batch, splitting it in half whenever the reply cannot be parsed.
+
+    A single file that still fails after its retries is left unscored.
+    """
+    files = await request_scores(batch)
+    if files is not None:
+        return files
+    if len(batch) > 1:
+        middle = len(batch) // 2
+        first, second = await asyncio.gather(score_batch(batch[:middle], retries),
+                                             score_batch(batch[middle:], retries))
+        return first + second
+    if retries > 0:
+        return await score_batch(batch, retries - 1)
+    print(f"Could not score {batch[0]['filename']}; leaving it unscored.")
+    return []
+
+
+async def get_scores_async(pr_files):
+    scored_files = []
+    pending_files = []
+    files = [file for file in pr_files if 'patch' in file]
+    # One trip to the executor for the whole PR rather than one per file
+    cached_scores = await async_runtime.run_io(
+        lambda: [llm_cache.get(score_cache_key(file)) for file in files])
+    for file, cached in zip(files, cached_scores):
+        record_cache("llm", cached is not None)
+        if cached is not None:
+            scored_files.append(cached)
+        else:
+            pending_files.append(file)
+
+    if not pending_files:
+        return {"files": scored_files}
+
+    # Batches run concurrently, so latency follows the largest batch rather than the PR size
+    batches = batch_files(pending_files)
+    batch_results = await asyncio.gather(*(score_batch(batch) for batch in batches))
+
+    pending_by_name = {file["filename"]: file for file in pending_files}
+    new_entries = []
+    for batch_scores in batch_results:
+        for score_file in batch_scores:
+            file = pending_by_name.get(score_file.get("filename"))
+            if file is not None:
+                new_entries.append((score_cache_key(file), score_file))
+            scored_files.append(score_file)
+    await async_runtime.run_io(lambda: [llm_cache.set(key, value) for key, value in new_entries])
+
+    return {"files": scored_files}
@@ -0,0 +1,515 @@
+from dotenv import load_dotenv
+import asyncio
+import os
+import re
+
+import async_runtime
+from ai import estimate_tokens, get_scores_async, get_summary_text_async
+from concurrency import SingleFlight
+from diff import parse_file
+from github_client import GitHubError, get_compare_async, get_pr_data_async, get_pr_file_list_async, get_repo_data_async
+from instrumentation import RequestTimer, registry
+from store import Analysis, MemoryStore, analysis_key, create_store
+from suggestions import get_suggestions
+from triage import rules_for, triage_files
+
+load_dotenv()
+
+PR_URL_PATTERN = re.compile(r"https://github\.com/([^/]+)/([^/]+)/pull/(\d+)")
+
+# PRs analyzed at once by one batch request, and the most one request may name
+API_BATCH_CONCURRENCY = int(os.getenv("API_BATCH_CONCURRENCY", "4"))
+API_BATCH_MAX_PRS = int(os.getenv("API_BATCH_MAX_PRS", "50"))
+
+# Fields of GitHub's file entries passed through in API results
+API_FILE_FIELDS = ("filename", "status", "additions", "deletions", "changes")
+
+# GitHub's compare API lists at most this many files
+COMPARE_MAX_FILES = 300
+
+# Finished analyses, served again while the head is unchanged and reused file by file after a push
+analysis_store = create_store()
+# Analyses recently stored or loaded, kept parsed for views of the same head and its diff fragments
+ANALYSIS_RECENT_ENTRIES = int(os.getenv("ANALYSIS_RECENT_ENTRIES", "16"))
+recent_analyses = MemoryStore(ANALYSIS_RECENT_ENTRIES)
+
+# Analyses in progress in this process, by (owner, repo, pr_number, head_sha); concurrent
+# viewers of the same head share one, and other workers wait on its lease in the store
+analysis_flights = SingleFlight("analysis")
+# Seconds between checks on a head another worker is analyzing
+ANALYSIS_LEASE_POLL_INTERVAL = 0.25
+
+registry.describe("analysis_store_requests_total", "Analyses served from the store (hit) or computed (miss).")
+registry.describe("llm_tokens_saved_total", "Estimated prompt tokens not sent to the model, by triage category.")
+registry.describe("incremental_files_total", "Files in computed analyses, by whether their results were reused.")
+registry.describe("analysis_lease_waits_total", "Analyses that waited for another worker analyzing the same head.")
+
+
+class AnalysisProgress:
+    """
+    Receives the parts of an analysis as analyze_pr() produces them.
+
+    The methods do nothing here; a caller that shows the analysis as it
+    progresses, like a background job, overrides the ones it needs. Only the
+    call that runs an analysis hears about its progress; calls that join one
+    already in flight, or are served from the store, just get the result.
+    """
+
+    async def fetched(self, pr_data, repo_data):
+        """The PR and its repository have been fetched from GitHub."""
+
+    async def suggested(self, pr_files, suggestions):
+        """Every file has its parsed diff and suggestions, but not yet its score."""
+
+    async def analyzed(self, analysis):
+        """The files are scored and the analysis stored, but the summary may still be running."""
+
+    async def summarized(self, summary):
+        """The summary, in markdown, is ready."""
+
+
+def parse_pr_url(pr_url):
+    """
+    Splits a GitHub pull request URL into its parts.
+
+    Returns:
+        tuple or None: (owner, repo, pr_number), or None if the URL is not a PR URL.
+    """
+    match = PR_URL_PATTERN.match(pr_url or "")
+    return match.groups() if match else None
+
+
+def process_pr_files(files_data):
+    # Parse each file's patch once; the analyzers reuse the same parsed diff
+    for file in files_data:
+        if "patch" in file:
+            file["lines"] = parse_file(file)
+
+    return files_data
+
+
+async def get_scores_triaged(pr_files, rules=None):
+    """
+    Scores files, sending the model only those the triage rules cannot settle.
+
+    Lockfiles, vendored, generated, minified and snapshot files are scored
+    locally; see triage.py.
+    """
+    triaged, remaining, tokens_saved = await async_runtime.run_cpu(triage_files, pr_files, rules)
+    for category, tokens in tokens_saved.items():
+        registry.inc("llm_tokens_saved_total", tokens, category=category)
+    scores = await get_scores_async(remaining)
+    return {"files": triaged + scores["files"]}
+
+
+def apply_scores(pr_files, scores):
+    """Copies each file's score onto it and sorts the files for review order."""
+    scores_by_file = {sf["filename"]: sf for sf in scores["files"]}
+    for pr_file in pr_files:
+        score_file = scores_by_file.get(pr_file["filename"], {})
+        pr_file["is_vulnerable"] = score_file.get("status") == "vulnerable"
+        pr_file["importance_score"] = score_file.get("importance_score", 0)
+        pr_file["vulnerability_summary"] = score_file.get("vulnerability_summary", None)
+        pr_file["triage"] = score_file.get("triage")
+
+    # Sort files by vulnerability and importance score
+    pr_files.sort(
+        key=lambda x: (
+            x.get("is_vulnerable", False),  # Prioritize vulnerable files
+            x.get("importance_score", 0)
+        ),
+        reverse=True
+    )
+    return pr_files
+
+
+def pr_context(pr_data, repo_data):
+    """The PR and repository details shown in the page header."""
+    # Extract necessary details
+    return {
+        "org_name": repo_data.get("owner", {}).get("login", "Unknown Org"),
+        "org_logo": repo_data.get("owner", {}).get("avatar_url", ""),
+        "org_url": repo_data.get("owner", {}).get("html_url", ""),
+        "repo_name": repo_data.get("name", "Unknown Repo"),
+        "repo_url": repo_data.get("html_url", ""),
+        "pr_title": pr_data.get("title", "PR title unavailable"),
+        "pr_number": pr_data.get("number", ""),
+        "pr_link": pr_data.get("html_url", ""),
+    }
+
+
+def repository_result(full_name, repo_data):
+    """The repository metadata included in API results, under the owner/repo name PRs refer to."""
+    owner = repo_data.get("owner", {})
+    return {
+        "full_name": full_name,
+        "name": repo_data.get("name"),
+        "html_url": repo_data.get("html_url"),
+        "owner": {
+            "login": owner.get("login"),
+            "avatar_url": owner.get("avatar_url"),
+            "html_url": owner.get("html_url"),
+        },
+    }
+
+
+def file_results(pr_files, pr_suggestions):
+    """Per-file API results in review order, each with its own suggestions."""
+    suggestions_by_file = {}
+    for suggestion in pr_suggestions:
+        suggestions_by_file.setdefault(suggestion["filename"], []).append({
+            "line_number": suggestion["line_number"],
+            "suggestion_text": suggestion["suggestion_text"],
+            "suggestion_type": suggestion["suggestion_type"],
+        })
+
+    results = []
+    for pr_file in pr_files:
+        result = {field: pr_file.get(field) for field in API_FILE_FIELDS}
+        result["is_vulnerable"] = pr_file.get("is_vulnerable", False)
+        result["importance_score"] = pr_file.get("importance_score", 0)
+        result["vulnerability_summary"] = pr_file.get("vulnerability_summary")
+        result["triage"] = pr_file.get("triage")
+        result["suggestions"] = suggestions_by_file.get(pr_file["filename"], [])
+        results.append(result)
+    return results
+
+
+async def changed_files(owner, repo, base, head):
+    """
+    Filenames whose content differs between two commits, per the compare API.
+
+    Returns:
+        set or None: None if the comparison is unavailable (e.g. after a force
+            push) or truncated, in which case only blob SHAs can be relied on.
+    """
+    try:
+        comparison = await get_compare_async(owner, repo, base, head)
+    except GitHubError as e:
+        print(f"Could not compare {base}...{head} in {owner}/{repo}: {e}")
+        return None
+    files = comparison.get("files") or []
+    if len(files) >= COMPARE_MAX_FILES:
+        return None
+    changed = set()
+    for file in files:
+        changed.add(file["filename"])
+        if file.get("previous_filename"):
+            changed.add(file["previous_filename"])
+    return changed
+
+
+async def reusable_files(owner, repo, previous, head_sha, pr_files):
+    """
+    Finds the files whose results in a previous analysis still hold at head_sha.
+
+    A file is reused when the compare API shows no change to it since the
+    previous head and it still has the same blob SHA and patch. The patch can
+    change on its own when the base branch moves.
+
+    Returns:
+        dict: {filename: file dict from the previous analysis}
+    """
+    if previous is None:
+        return {}
+    changed = set() if previous.head_sha == head_sha else await changed_files(
+        owner, repo, previous.head_sha, head_sha)
+
+    previous_files = {file["filename"]: file for file in previous.files}
+    reusable = {}
+    for file in pr_files:
+        filename = file["filename"]
+        old = previous_files.get(filename)
+        if old is None or (changed is not None and filename in changed):
+            continue
+        if old.get("sha") != file.get("sha") or old.get("patch") != file.get("patch"):
+            continue
+        # A file that could not be scored last time gets another try
+        if "patch" in file and filename not in previous.scores:
+            continue
+        reusable[filename] = old
+    return reusable
+
+
+async def analyze_pr(owner, repo, pr_number, timer, summary=True, before=None, repo_data=None, progress=None):
+    """
+    The analysis of a PR at its current head, taken from the store when possible.
+
+    An analysis stored for the same head is returned as it is, unless a summary
+    is wanted and it has none; only the PR itself is fetched to learn its head,
+    and the file list is left alone. Otherwise the PR is analyzed incrementally from
+    the analysis of the push's `before` commit, or else the latest one stored
+    for the PR. Unchanged files keep their parsed diff, suggestions and score,
+    and only the other files go through the analyzers and the model. The new
+    analysis is stored.
+
+    Concurrent calls for the same head share one analysis: within the process
+    through analysis_flights, and across workers through a lease in the store.
+
+    Parameters:
+        timer (RequestTimer): Records the duration of each stage.
+        summary (bool): Whether the analysis must include the summary.
+        before (str): The head SHA before a push, when known from a webhook.
+        repo_data (asyncio.Future): Repository metadata shared with other PRs of
+            the same repository; fetched here when not given.
+        progress (AnalysisProgress): Told about each part of the analysis as it is ready.
+
+    Returns:
+        Analysis: The stored analysis.
+
+    Raises:
+        GitHubError: If the PR could not be fetched.
+    """
+    # The PR is revalidated with a conditional request, so checking for a new head is cheap
+    # when nothing changed; the file list is only needed once the head turns out not to be stored
+    with timer.stage("github"):
+        pr_data = await get_pr_data_async(owner, repo, pr_number)
+    head_sha = pr_data.get("head", {}).get("sha")
+    progress = progress or AnalysisProgress()
+
+    stored = await find_analysis(owner, repo, pr_number, head_sha)
+    if stored is not None and (stored.summary is not None or not summary):
+        registry.inc("analysis_store_requests_total", result="hit")
+        await progress.fetched(pr_data, stored.repo_data)
+        return stored
+    registry.inc("analysis_store_requests_total", result="miss")
+
+    if repo_data is None:
+        repo_data = get_repo_data_async(owner, repo)
+    else:
+        # Another PR may still be waiting on the shared fetch, so never cancel it from here
+        repo_data = asyncio.shield(repo_data)
+    with timer.stage("github"):
+        repo_data, pr_files = await asyncio.gather(repo_data, get_pr_file_list_async(owner, repo, pr_number))
+    await progress.fetched(pr_data, repo_data)
+
+    key = analysis_key(owner, repo, pr_number, head_sha)
+    while True:
+        analysis = await analysis_flights.run(key, analyze_head, key, timer, summary, before, stored,
+                                              pr_data, repo_data, pr_files, progress)
+        # A shared analysis made without the summary is only good enough if none is wanted
+        if analysis.summary is not None or not summary:
+            return analysis
+        stored = analysis
+
+
+async def find_analysis(owner, repo, pr_number, head_sha):
+    """
+    The stored analysis of a head, or None.
+
+    Analyses loaded or made recently are kept parsed in this process, so a
+    page viewed again is served without reading and parsing the record again.
+    A copy kept here may lack a summary that was added to the store since.
+    """
+    analysis = recent_analyses.get(owner, repo, pr_number, head_sha)
+    if analysis is None:
+        # The store may be a database file, so it is read off the event loop
+        analysis = await async_runtime.run_io(analysis_store.get, owner, repo, pr_number, head_sha)
+        if analysis is not None:
+            recent_analyses.put(analysis)
+    return analysis
+
+
+async def save_analysis(analysis):
+    await async_runtime.run_io(analysis_store.put, analysis)
+    recent_analyses.put(analysis)
+
+
+async def claim_analysis(key):
+    """
+    Waits until no other worker is analyzing a head, then claims it for this one.
+
+    Returns:
+        bool: Whether another worker held it first, and so may have stored the analysis meanwhile.
+    """
+    waited = False
+    while not await async_runtime.run_io(analysis_store.claim, key):
+        if not waited:
+            registry.inc("analysis_lease_waits_total")
+            waited = True
+        await asyncio.sleep(ANALYSIS_LEASE_POLL_INTERVAL)
+    return waited
+
+
+async def release_analysis(key):
+    await async_runtime.run_io(analysis_store.release, key)
+
+
+async def analyze_head(key, timer, summary, before, stored, pr_data, repo_data, pr_files, progress):
+    """Analyzes one head of a PR for analyze_pr() while holding its lease."""
+    if await claim_analysis(key):
+        stored = await async_runtime.run_io(analysis_store.get, *key)
+        if stored is not None and (stored.summary is not None or not summary):
+            await release_analysis(key)
+            return stored
+    try:
+        return await analyze_files(key, timer, summary, before, stored, pr_data, repo_data, pr_files, progress)
+    finally:
+        await release_analysis(key)
+
+
+async def analyze_files(key, timer, summary, before, stored, pr_data, repo_data, pr_files, progress):
+    """
+    Analyzes the files of one head, reusing what still holds from an earlier analysis.
+
+    The scores and summary are requested from the model first, and the local
+    suggestions are computed while they run. The analysis is stored once the
+    files are scored, and again with the summary if one was wanted.
+    """
+    owner, repo, pr_number, head_sha = key
+    previous = stored
+    if previous is None and before:
+        previous = await async_runtime.run_io(analysis_store.get, owner, repo, pr_number, before)
+    if previous is None:
+        previous = await async_runtime.run_io(analysis_store.latest, owner, repo, pr_number)
+    reused = await reusable_files(owner, repo, previous, head_sha, pr_files)
+    new_files = []
+    for file in pr_files:
+        old = reused.get(file["filename"])
+        if old is None:
+            new_files.append(file)
+        elif "lines" in old:
+            file["lines"] = old["lines"]
+    new_files = await async_runtime.run_cpu(process_pr_files, new_files)
+    registry.inc("incremental_files_total", len(reused), kind="reused")
+    registry.inc("incremental_files_total", len(new_files), kind="analyzed")
+
+    scores_task = asyncio.ensure_future(
+        timer.measure("scores", get_scores_triaged(new_files, rules_for(owner, repo))))
+    # The summary prompt names the first files, so it gets them in GitHub's order rather than review order
+    summary_task = asyncio.ensure_future(
+        timer.measure("summary", get_summary_text_async(list(pr_files)))) if summary else None
+    try:
+        new_suggestions = await timer.measure("suggestions", async_runtime.run_cpu(get_suggestions, new_files))
+        pr_suggestions = [suggestion for suggestion in previous.suggestions
+                          if suggestion["filename"] in reused] if reused else []
+        pr_suggestions.extend(new_suggestions)
+        await progress.suggested(pr_files, pr_suggestions)
+
+        new_scores = await scores_task
+        scores = {filename: previous.scores[filename] for filename in reused if filename in previous.scores}
+        scores.update({score_file["filename"]: score_file for score_file in new_scores["files"]
+                       if "filename" in score_file})
+        apply_scores(pr_files, {"files": list(scores.values())})
+
+        # Stored before the summary is awaited, so the diffs it shows collapsed can already be loaded
+        analysis = Analysis(owner, repo, pr_number, head_sha, pr_data, repo_data, pr_files, pr_suggestions, scores)
+        await save_analysis(analysis)
+        await progress.analyzed(analysis)
+
+        if summary_task is not None:
+            analysis.summary = await summary_task
+            await progress.summarized(analysis.summary)
+            await save_analysis(analysis)
+        return analysis
+    finally:
+        # Only still running if something above failed
+        scores_task.cancel()
+        if summary_task is not None:
+            summary_task.cancel()
+
+
+def load_analysis(owner, repo, pr_number, head_sha):
+    """
+    A stored analysis, for the requests that page through its diffs.
+
+    Returns:
+        Analysis or None: None if nothing is stored for that head.
+    """
+    analysis = recent_analyses.get(owner, repo, pr_number, head_sha)
+    if analysis is None:
+        analysis = analysis_store.get(owner, repo, pr_number, head_sha)
+        if analysis is not None:
+            recent_analyses.put(analysis)
+    return analysis
+
+
+def analysis_result(analysis):
+    """An analysis as a JSON-serializable dict, for the API."""
+    return {
+        "pr": {
+            "number": analysis.pr_data.get("number"),
+            "title": analysis.pr_data.get("title"),
+            "html_url": analysis.pr_data.get("html_url"),
+            "head_sha": analysis.head_sha,
+        },
+        "repository": f"{analysis.owner}/{analysis.repo}",
+        "summary": analysis.summary,
+        "files": file_results(analysis.files, analysis.suggestions),
+        "triage": {
+            "files": sum(1 for file in analysis.files if file.get("triage")),
+            "tokens_saved": sum(estimate_tokens(file["patch"]) for file in analysis.files if file.get("triage")),
+        },
+    }
+
+
+async def analyze_pr_result(owner, repo, pr_number, timer, summary=True, repo_data=None):
+    """
+    Analyzes a PR for the JSON API, without rendering any HTML.
+
+    Parameters:
+        timer (RequestTimer): Records the duration of each stage.
+        summary (bool): Whether to include the summary, in markdown.
+        repo_data (asyncio.Future): Repository metadata shared with other PRs of
+            the same repository; fetched here when not given.
+
+    Returns:
+        tuple: (result, repo_data), where result is a JSON-serializable dict.
+
+    Raises:
+        GitHubError: If the PR could not be fetched.
+    """
+    analysis = await analyze_pr(owner, repo, pr_number, timer, summary=summary, repo_data=repo_data)
+    return analysis_result(analysis), analysis.repo_data
+
+
+async def analyze_batch(prs, concurrency=API_BATCH_CONCURRENCY, summary=True):
+    """
+    Analyzes several PRs concurrently, yielding each result as soon as it is done.
+
+    Repository metadata is fetched once per repository and yielded once, as a
+    `repository` record just before the first PR from that repository.
+
+    Parameters:
+        prs (list): (pr_url, owner, repo, pr_number) tuples.
+        concurrency (int): PRs analyzed at once.
+        summary (bool): Whether to include each PR's summary.
+
+    Yields:
+        dict: `{"type": "repository", ...}` and `{"type": "pr", "pr_url": ..., ...}` records.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    repositories = {}
+
+    def shared_repo_data(owner, repo):
+        key = (owner, repo)
+        if key not in repositories:
+            repositories[key] = asyncio.ensure_future(get_repo_data_async(owner, repo))
+        return repositories[key]
+
+    async def analyze_one(pr_url, owner, repo, pr_number):
+        async with semaphore:
+            try:
+                result, repo_data = await analyze_pr_result(
+                    owner, repo, pr_number, RequestTimer(), summary, shared_repo_data(owner, repo))
+            except GitHubError as e:
+                result, repo_data = {"error": str(e)}, None
+            except Exception as e:
+                print(f"Error analyzing {pr_url}: {e}")
+                result, repo_data = {"error": "Analysis failed"}, None
+        return dict(result, type="pr", pr_url=pr_url), owner, repo, repo_data
+
+    tasks = [asyncio.ensure_future(analyze_one(*pr)) for pr in prs]
+    sent_repositories = set()
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result, owner, repo, repo_data = await next_done
+            key = f"{owner}/{repo}"
+            if repo_data is not None and key not in sent_repositories:
+                sent_repositories.add(key)
+                yield dict(repository_result(key, repo_data), type="repository")
+            yield result
+    finally:
+        # The client may stop reading early; don't keep analyzing for nobody
+        for task in tasks + list(repositories.values()):
+            task.cancel()
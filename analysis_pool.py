@@ -0,0 +1,210 @@
+from collections import deque
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker processes for CPU-bound static analysis, shared by every request
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", str(os.cpu_count() or 1)))
+# Seconds one file may run in a worker, counted from when the worker starts it
+ANALYSIS_FILE_TIMEOUT = float(os.getenv("ANALYSIS_FILE_TIMEOUT", "30"))
+# PRs with at most this many files are analyzed on the calling thread
+ANALYSIS_INLINE_MAX_FILES = int(os.getenv("ANALYSIS_INLINE_MAX_FILES", "4"))
+
+# How often a call with files still queued looks for workers freed by other calls
+_IDLE_POLL_SECONDS = 0.05
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _serve(conn):
+    """Worker process loop: runs each (fn, args) task received and sends back (ok, value)."""
+    while True:
+        try:
+            fn, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = (True, fn(*args))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # The result or exception could not be pickled
+            conn.send((False, RuntimeError(repr(e))))
+
+
+class Worker:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, context):
+        """One worker process and the pipe its tasks are sent over."""
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(self, size):
+        """
+        Long-lived worker processes handed out one task at a time.
+
+        Unlike a ProcessPoolExecutor, every task is known to be running on a
+        particular process, so a task that runs too long can be stopped by
+        killing just that process; the others, which may be working for other
+        requests, carry on. Processes are started on demand up to `size`, and
+        a killed one is replaced the next time a worker is needed.
+
+        Parameters:
+            size (int): Most worker processes alive at once.
+        """
+        self.size = size
+        self._idle = []
+        self._alive = 0
+        self._changed = threading.Condition()
+        # forkserver children do not inherit the parent's threads and locks
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+        self._context = multiprocessing.get_context(method)
+
+    def acquire(self, block=True):
+        """
+        Takes an idle worker, starting one if the pool is not full.
+
+        Returns:
+            Worker or None: None if `block` is false and every worker is busy.
+        """
+        with self._changed:
+            while not self._idle and self._alive >= self.size:
+                if not block:
+                    return None
+                self._changed.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._alive += 1
+        try:
+            return Worker(self._context)
+        except Exception:
+            self._forget()
+            raise
+
+    def release(self, worker):
+        with self._changed:
+            self._idle.append(worker)
+            self._changed.notify()
+
+    def discard(self, worker):
+        """Kills a worker that is stuck or dead, making room for a fresh one."""
+        worker.kill()
+        self._forget()
+
+    def _forget(self):
+        with self._changed:
+            self._alive -= 1
+            self._changed.notify()
+
+
+def get_pool():
+    """Returns the long-lived worker pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(ANALYSIS_PROCESSES)
+        return _pool
+
+
+def map_files(fn, items, default=None):
+    """
+    Runs fn(*item) for every item, in worker processes when there are enough items.
+
+    Each file gets ANALYSIS_FILE_TIMEOUT seconds from when a worker starts it,
+    however long it waited for one. A file still running after that is
+    skipped and only the worker running it is killed.
+
+    Parameters:
+        fn: A module-level (picklable) function.
+        items (list): Argument tuples, one per file, each starting with the filename.
+        default: Result used for an item that times out or whose worker dies.
+
+    Returns:
+        list: Results in the same order as items.
+
+    Raises:
+        Exception: The first exception raised by fn, once every item has finished.
+    """
+    if len(items) <= ANALYSIS_INLINE_MAX_FILES or ANALYSIS_PROCESSES <= 1:
+        return [fn(*item) for item in items]
+
+    pool = get_pool()
+    results = [default] * len(items)
+    errors = []
+    pending = deque(enumerate(items))
+    # {worker: (item index, time the worker was handed the item)}
+    running = {}
+    try:
+        while pending or running:
+            while pending:
+                # Block for a worker only when nothing of ours is running to wait on instead
+                worker = pool.acquire(block=not running)
+                if worker is None:
+                    break
+                index, item = pending[0]
+                try:
+                    worker.conn.send((fn, item))
+                except OSError:
+                    # The worker died while idle
+                    pool.discard(worker)
+                    continue
+                pending.popleft()
+                running[worker] = (index, time.monotonic())
+
+            oldest = min(started for _, started in running.values())
+            timeout = max(0.0, oldest + ANALYSIS_FILE_TIMEOUT - time.monotonic())
+            if pending:
+                timeout = min(timeout, _IDLE_POLL_SECONDS)
+            ready = set(wait([worker.conn for worker in running] +
+                             [worker.process.sentinel for worker in running], timeout=timeout))
+
+            now = time.monotonic()
+            for worker, (index, started) in list(running.items()):
+                filename = items[index][0]
+                if worker.conn in ready or worker.process.sentinel in ready:
+                    del running[worker]
+                    try:
+                        ok, value = worker.conn.recv() if worker.conn.poll() else (None, None)
+                    except (EOFError, OSError):
+                        ok = None
+                    if ok is None:
+                        # The worker died (e.g. out of memory)
+                        print(f"Analysis worker died while analyzing {filename}; skipping it.")
+                        pool.discard(worker)
+                        continue
+                    pool.release(worker)
+                    if ok:
+                        results[index] = value
+                    else:
+                        errors.append(value)
+                elif now - started >= ANALYSIS_FILE_TIMEOUT:
+                    del running[worker]
+                    print(f"Analysis of {filename} did not finish within {ANALYSIS_FILE_TIMEOUT}s; skipping it.")
+                    pool.discard(worker)
+    finally:
+        # Only reached with work in flight if this call was interrupted; those workers are mid-task
+        for worker in running:
+            pool.discard(worker)
+
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from instrumentation import PROFILING, attributed, profiled_task_factory
+
+load_dotenv()
+
+# Threads for CPU-bound work (diff analysis, template rendering) started from coroutines
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, (os.cpu_count() or 1) + 2))))
+# Threads for blocking cache and store reads and writes (disk, SQLite) started from coroutines
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+
+_loop = None
+_loop_lock = threading.Lock()
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+# Kept apart from cpu_executor, so lookups are not queued behind long analyses
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+
+def get_loop():
+    """
+    Returns the process-wide event loop, starting its thread on first use.
+
+    All outbound I/O (GitHub, OpenAI) runs as coroutines on this one loop, so
+    any number of analyses can be in flight while request threads only wait
+    for their own result. The loop is started lazily so that each gunicorn
+    worker gets its own after forking.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            if PROFILING:
+                # Lets a request's profile follow its coroutines onto the loop
+                loop.set_task_factory(profiled_task_factory)
+            thread = threading.Thread(target=loop.run_forever, daemon=True, name="event-loop")
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def submit(coro):
+    """Schedules a coroutine on the shared loop and returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro, timeout=None):
+    """Runs a coroutine on the shared loop and blocks the calling thread for its result."""
+    return submit(coro).result(timeout)
+
+
+def iterate(async_iterable):
+    """Consumes an async iterator from synchronous code, one item at a time."""
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                yield run(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Closing early (e.g. the client disconnected) still cleans up the producer
+        if hasattr(iterator, "aclose"):
+            run(iterator.aclose())
+
+
+async def run_cpu(fn, *args):
+    """Runs a blocking, CPU-bound function on the shared executor without blocking the loop."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, attributed(fn), *args)
+
+
+async def run_io(fn, *args):
+    """Runs a blocking I/O call (a cache or store lookup) on the I/O executor without blocking the loop."""
+    return await asyncio.get_running_loop().run_in_executor(io_executor, attributed(fn), *args)
@@ -0,0 +1,107 @@
+"""
+Render benchmark for templates/insights.html.
+
+Renders a synthetic PR with the indexed suggestion lookup used by the app and
+with the previous per-line scan over every suggestion, and prints both timings.
+
+Run from the repository root:
+    python benchmarks/bench_render.py --files 50 --lines 400 --suggestions 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+# Nothing here is analyzed, so nothing should be stored either
+os.environ["ANALYSIS_STORE_BACKEND"] = "memory"
+
+from flask import render_template, render_template_string  # noqa: E402
+
+import diff_view  # noqa: E402
+from analysis import process_pr_files  # noqa: E402
+from main import app  # noqa: E402
+from suggestions import index_suggestions  # noqa: E402
+
+# The diff loop as it was before suggestions were indexed
+LEGACY_TEMPLATE = """
+{% for file in pr_files %}
+    {% for line in file.lines %}
+        <tr class="diff-line {{ line.type }}">
+            <td class="line-number">{{ line.old_line_num }}</td>
+            <td class="line-number">{{ line.new_line_num }}</td>
+            <td class="line-content">{{ line.content[1:] }}
+            {% for suggestion in pr_suggestions %}
+                {% if suggestion.filename == file.filename and suggestion.line_number == line.new_line_num %}
+                    <div class="pending-comment">{{ suggestion.suggestion_text }}</div>
+                {% endif %}
+            {% endfor %}
+            </td>
+        </tr>
+    {% endfor %}
+{% endfor %}
+"""
+
+
+def make_pr(num_files, lines_per_file, num_suggestions, seed=0):
+    rng = random.Random(seed)
+    pr_files = []
+    for i in range(num_files):
+        body = [f"+    value_{j} = compute({j})" if rng.random() < 0.6 else f"     unchanged_{j}()"
+                for j in range(lines_per_file)]
+        pr_files.append({
+            "filename": f"src/module_{i}.py",
+            "sha": f"bench-{seed}-{i}",
+            "status": "modified",
+            "additions": lines_per_file,
+            "deletions": 0,
+            "changes": lines_per_file,
+            "patch": f"@@ -1,{lines_per_file} +1,{lines_per_file} @@\n" + "\n".join(body),
+        })
+    suggestions = [{
+        "filename": f"src/module_{rng.randrange(num_files)}.py",
+        "line_number": rng.randint(1, lines_per_file),
+        "suggestion_text": "Line exceeds 80 characters.",
+        "suggestion_type": "Line Break Suggestion",
+    } for _ in range(num_suggestions)]
+    return process_pr_files(pr_files), suggestions
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=400)
+    parser.add_argument("--suggestions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pr_files, suggestions = make_pr(args.files, args.lines, args.suggestions)
+    # Render every line inline, as the legacy loop does, instead of the first window of each file
+    diff_view.DIFF_WINDOW_LINES = diff_view.DIFF_INLINE_MAX_LINES = args.files * args.lines
+
+    with app.test_request_context():
+        indexed = best_of(args.repeat, lambda: render_template(
+            "insights.html", pr_files=pr_files, pr_summary="", scores_pending=True,
+            suggestion_index=index_suggestions(suggestions)))
+        legacy = best_of(args.repeat, lambda: render_template_string(
+            LEGACY_TEMPLATE, pr_files=pr_files, pr_suggestions=suggestions))
+
+    print(f"{args.files} files x {args.lines} lines, {args.suggestions} suggestions")
+    print(f"  indexed lookup:   {indexed * 1000:9.1f} ms")
+    print(f"  linear scan:      {legacy * 1000:9.1f} ms")
+    print(f"  speedup:          {legacy / indexed:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Local stand-ins for the GitHub API and the OpenAI client.
+
+FakeGitHubServer is a real HTTP server on 127.0.0.1, so the pooled client,
+pagination, conditional requests and rate-limit handling in github_client are
+exercised end to end.
+FakeOpenAI replaces ai.client and answers with well-formed summaries and scores.
+webhook_request builds signed webhook deliveries for the webhook endpoint.
+Both take a latency in seconds that is added to every call.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import asyncio
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+
+
+class FakeGitHubServer:
+    """Serves one PR's metadata and files for any owner/repo/number."""
+
+    def __init__(self, pr_files, latency=0.0, head_sha="0" * 40, rate_limit=None, rate_limit_window=1.0):
+        """
+        Parameters:
+            rate_limit (int): Requests allowed per token (Authorization header) in each
+                window; further requests get a 403 with the rate-limit headers GitHub
+                sends. 304s are not counted, as on GitHub. None disables the limit.
+            rate_limit_window (float): Seconds until each token's allowance resets.
+        """
+        self.pr_files = pr_files
+        self.latency = latency
+        self.head_sha = head_sha
+        # Files at every head pushed so far, for the compare endpoint
+        self.snapshots = {head_sha: pr_files}
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.requests = 0
+        self.not_modified = 0
+        self.rate_limited = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, not_modified):
+        with self._lock:
+            self.requests += 1
+            if not_modified:
+                self.not_modified += 1
+
+    def push(self, pr_files, head_sha):
+        """Replaces the PR's files as a new push would; returns the previous head SHA."""
+        before = self.head_sha
+        self.pr_files = pr_files
+        self.head_sha = head_sha
+        self.snapshots[head_sha] = pr_files
+        return before
+
+    def _compare(self, base, head):
+        if base not in self.snapshots or head not in self.snapshots:
+            return None
+        base_shas = {file["filename"]: file.get("sha") for file in self.snapshots[base]}
+        head_shas = {file["filename"]: file.get("sha") for file in self.snapshots[head]}
+        files = [{"filename": filename, "sha": sha, "status": "modified" if filename in base_shas else "added"}
+                 for filename, sha in head_shas.items() if base_shas.get(filename) != sha]
+        files += [{"filename": filename, "sha": None, "status": "removed"}
+                  for filename in base_shas if filename not in head_shas]
+        return {"status": "ahead", "files": files}
+
+    def _take(self, authorization, not_modified):
+        """Counts a request against its token; returns (allowed, rate-limit headers)."""
+        if self.rate_limit is None:
+            return True, {}
+        now = time.time()
+        with self._lock:
+            reset, used = self._windows.get(authorization, (0.0, 0))
+            if now >= reset:
+                reset, used = now + self.rate_limit_window, 0
+            allowed = used < self.rate_limit
+            if allowed and not not_modified:
+                used += 1
+            elif not allowed:
+                self.rate_limited += 1
+            self._windows[authorization] = (reset, used)
+        return allowed, {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(self.rate_limit - used),
+            "X-RateLimit-Reset": f"{reset:.3f}",
+        }
+
+    def _route(self, path, query, host):
+        """Returns (body, extra_headers) for a GET, or (None, None) for a 404."""
+        parts = path.strip("/").split("/")
+        # repos/{owner}/{repo}[/pulls/{n}[/files]]
+        if len(parts) == 3 and parts[0] == "repos":
+            owner, repo = parts[1], parts[2]
+            return {
+                "name": repo,
+                "html_url": f"https://github.com/{owner}/{repo}",
+                "owner": {"login": owner, "avatar_url": "", "html_url": f"https://github.com/{owner}"},
+            }, {}
+        if len(parts) == 5 and parts[3] == "compare":
+            base, _, head = parts[4].partition("...")
+            return self._compare(base, head), {}
+        if len(parts) == 5 and parts[3] == "pulls":
+            owner, repo, number = parts[1], parts[2], parts[4]
+            return {
+                "title": f"Synthetic PR with {len(self.pr_files)} files",
+                "number": int(number),
+                "html_url": f"https://github.com/{owner}/{repo}/pull/{number}",
+                "head": {"sha": self.head_sha},
+            }, {}
+        if len(parts) == 6 and parts[3] == "pulls" and parts[5] == "files":
+            per_page = int(query.get("per_page", ["30"])[0])
+            page = int(query.get("page", ["1"])[0])
+            items = self.pr_files[(page - 1) * per_page:page * per_page]
+            last = max(1, -(-len(self.pr_files) // per_page))
+            headers = {}
+            if last > 1:
+                headers["Link"] = f'<http://{host}{path}?per_page={per_page}&page={last}>; rel="last"'
+            return items, headers
+        return None, None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                parsed = urlparse(self.path)
+                data, headers = fake._route(parsed.path, parse_qs(parsed.query), self.headers["Host"])
+                if data is None:
+                    fake._count(False)
+                    self._send(404, b'{"message": "Not Found"}', {})
+                    return
+                body = json.dumps(data).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                not_modified = self.headers.get("If-None-Match") == etag
+                allowed, limit_headers = fake._take(self.headers.get("Authorization"), not_modified)
+                if not allowed:
+                    fake._count(False)
+                    self._send(403, b'{"message": "API rate limit exceeded"}', limit_headers)
+                    return
+                if not_modified:
+                    fake._count(True)
+                    self._send(304, b"", dict(limit_headers, ETag=etag))
+                    return
+                fake._count(False)
+                self._send(200, body, dict(headers, ETag=etag, **limit_headers))
+
+            def _send(self, status, body, headers):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def webhook_request(payload, secret, event="pull_request"):
+    """
+    The body and headers of a signed GitHub webhook delivery.
+
+    Returns:
+        tuple: (body, headers), ready for a test client or HTTP POST.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    signature = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return body, {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": event,
+        "X-GitHub-Delivery": hashlib.sha1(body).hexdigest(),
+        "X-Hub-Signature-256": f"sha256={signature}",
+    }
+
+
+def pull_request_payload(owner, repo, pr_number, action, head_sha, before=None):
+    """A minimal `pull_request` webhook payload."""
+    payload = {
+        "action": action,
+        "number": pr_number,
+        "pull_request": {"number": pr_number, "head": {"sha": head_sha}},
+        "repository": {"name": repo, "owner": {"login": owner}},
+    }
+    if before is not None:
+        payload["before"] = before
+        payload["after"] = head_sha
+    return payload
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.message = _Message(content)
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = prompt_tokens + completion_tokens
+
+
+class _Completion:
+    def __init__(self, content, prompt):
+        self.choices = [_Choice(content)]
+        self.usage = _Usage(len(prompt) // 4, len(content) // 4)
+
+
+class _Delta:
+    def __init__(self, content):
+        self.content = content
+
+
+class _StreamChoice:
+    def __init__(self, content):
+        self.delta = _Delta(content)
+
+
+class _Chunk:
+    def __init__(self, content=None, usage=None):
+        self.choices = [_StreamChoice(content)] if content is not None else []
+        self.usage = usage
+
+
+class FakeOpenAI:
+    """
+    Drop-in for the AsyncOpenAI client's chat.completions.create.
+
+    Scoring prompts get a JSON reply covering every file named in the prompt;
+    any other prompt gets a short markdown summary. With stream=True the reply
+    comes back word by word, followed by a usage-only chunk.
+    """
+
+    _FILENAME = re.compile(r"^\s*Filename: (.*)$", re.MULTILINE)
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = self
+        self.completions = self
+        self._lock = threading.Lock()
+
+    async def create(self, model, messages, **params):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        prompt = messages[-1]["content"]
+        content = self.reply(prompt)
+        if params.get("stream"):
+            return self._stream(content, prompt)
+        return _Completion(content, prompt)
+
+    def reply(self, prompt):
+        """The text of the reply to `prompt`; override it to make the model misbehave."""
+        filenames = self._FILENAME.findall(prompt)
+        if filenames:
+            return json.dumps({"files": [{
+                "filename": filename,
+                "status": "secure",
+                "importance_score": len(filename) % 10 + 1,
+                "vulnerability_summary": None,
+            } for filename in filenames]})
+        return "### Summary\nThis synthetic PR refactors **handlers** across modules."
+
+    async def _stream(self, content, prompt):
+        for word in re.findall(r"\S+\s*", content):
+            yield _Chunk(word)
+        yield _Chunk(usage=_Usage(len(prompt) // 4, len(content) // 4))
@@ -0,0 +1,179 @@
+"""
+Offline benchmark suite.
+
+Runs the hot paths of the app against a synthetic PR, with a local fake GitHub
+server and a fake OpenAI client, and writes the timings as JSON so runs can be
+compared.
+
+Run from the repository root:
+    python benchmarks/run.py --scenario mixed
+    python benchmarks/run.py --scenario mixed --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FakeGitHubServer, FakeOpenAI  # noqa: E402
+from benchmarks.synthetic import SCENARIOS, suggestions_for  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def measure(fn, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        # The analyzers print parse errors for partial snippets; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)["results"]
+    print(f"\n{'benchmark':<40}{'before ms':>12}{'after ms':>12}{'change':>10}")
+    for name, result in current.items():
+        if name not in previous:
+            continue
+        before = previous[name]["median_ms"]
+        after = result["median_ms"]
+        change = f"{before / after:.2f}x" if after else "-"
+        print(f"{name:<40}{before:>12.1f}{after:>12.1f}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--github-latency", type=float, default=0.02, help="seconds added to each fake GitHub call")
+    parser.add_argument("--openai-latency", type=float, default=0.2, help="seconds added to each fake OpenAI call")
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    args = parser.parse_args()
+
+    pr_files = SCENARIOS[args.scenario]()
+    server = FakeGitHubServer(pr_files, latency=args.github_latency).start()
+
+    # The app reads its configuration at import time
+    os.environ["GITHUB_API_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ["ANALYSIS_STORE_BACKEND"] = "memory"
+
+    from flask import render_template
+
+    import ai
+    import analysis
+    import diff
+    import github_client
+    import suggestions
+    from analysis import process_pr_files
+    from github_cache import ResponseCache
+    from llm_cache import create_cache
+    from main import app
+    from store import create_store
+
+    ai.client = FakeOpenAI(latency=args.openai_latency)
+    processed_files = process_pr_files([dict(file) for file in pr_files])
+    suggestion_index = suggestions.index_suggestions(suggestions_for(processed_files))
+
+    def reset_caches():
+        diff._cache.clear()
+        github_client.response_cache = ResponseCache(github_client.GITHUB_CACHE_MAX_BYTES)
+        ai.llm_cache = create_cache("memory")
+        analysis.analysis_store = create_store("memory")
+        analysis.recent_analyses = create_store("memory", max_entries=analysis.ANALYSIS_RECENT_ENTRIES)
+
+    def render():
+        with app.test_request_context():
+            render_template("insights.html", pr_files=processed_files, pr_summary="",
+                            suggestion_index=suggestion_index)
+
+    client = app.test_client()
+
+    def post_insights():
+        response = client.post("/insights", data={"pr_url": "https://github.com/bench/repo/pull/1"},
+                               follow_redirects=True)
+        assert response.status_code == 200, response.status_code
+
+    benchmarks = {
+        "parse_patch": (lambda: [diff.ParsedDiff(file["patch"]) for file in pr_files], None),
+        "check_readability": (lambda: suggestions.check_readability(pr_files), None),
+        "check_complexity_and_maintainability":
+            (lambda: suggestions.check_complexity_and_maintainability(pr_files), None),
+        "get_suggestions": (lambda: suggestions.get_suggestions(pr_files), None),
+        "render_insights": (render, None),
+        "post_insights_cold": (post_insights, reset_caches),
+        "post_insights_warm": (post_insights, None),
+    }
+
+    results = {}
+    for name, (fn, setup) in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, args.repeat, setup)
+        print(f"{name:<40}{results[name]['median_ms']:>12.1f} ms (median of {args.repeat})")
+
+    server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "scenario": args.scenario,
+            "files": len(pr_files),
+            "patch_lines": sum(file["patch"].count("\n") + 1 for file in pr_files),
+            "github_latency": args.github_latency,
+            "openai_latency": args.openai_latency,
+            "github_requests": server.requests,
+            "github_not_modified": server.not_modified,
+            "openai_calls": ai.client.calls,
+        },
+        "results": results,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{args.scenario}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
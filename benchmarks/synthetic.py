@@ -0,0 +1,164 @@
+"""
+Synthetic pull request generators for the benchmarks.
+
+Every generator returns GitHub-shaped file dicts (filename, sha, status,
+additions, deletions, changes, patch) and is deterministic for a given seed.
+"""
+import hashlib
+import random
+
+LANGUAGES = {
+    ".py": (
+        "def handler_{n}(data, value):\n"
+        "    if data and value > {n}:\n"
+        "        for item in data:\n"
+        "            if item.get('k') == {n}:\n"
+        "                return process(item, value)\n"
+        "    return None\n"
+    ),
+    ".js": (
+        "function handler{n}(data, value) {{\n"
+        "  if (data && value > {n}) {{\n"
+        "    data.forEach((item) => {{ if (item.k === {n}) {{ process(item, value); }} }});\n"
+        "  }}\n"
+        "  return null;\n"
+        "}}\n"
+    ),
+    ".c": (
+        "int handler_{n}(int data, char *buf) {{\n"
+        "    int value = data + {n};\n"
+        "    if (buf && value > 0) {{ return process(buf, value); }}\n"
+        "    return 0;\n"
+        "}}\n"
+    ),
+    ".go": (
+        "func Handler{n}(data []int, value int) int {{\n"
+        "    for _, item := range data {{\n"
+        "        if item == {n} {{ return value }}\n"
+        "    }}\n"
+        "    return 0\n"
+        "}}\n"
+    ),
+}
+
+
+def _sha(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def make_patch(extension, num_lines, rng, deletion_ratio=0.2, hunk_size=60):
+    """Builds a unified diff of roughly num_lines lines in the given language."""
+    template = LANGUAGES[extension]
+    body = []
+    n = 0
+    while len(body) < num_lines:
+        body.extend(template.format(n=n).splitlines())
+        n += 1
+    body = body[:num_lines]
+
+    patch_lines = []
+    old_line = new_line = 1
+    for start in range(0, len(body), hunk_size):
+        chunk = body[start:start + hunk_size]
+        rendered = []
+        old_count = new_count = 0
+        for line in chunk:
+            roll = rng.random()
+            if roll < deletion_ratio:
+                rendered.append("-" + line)
+                old_count += 1
+            elif roll < 0.7:
+                rendered.append("+" + line)
+                new_count += 1
+            else:
+                rendered.append(" " + line)
+                old_count += 1
+                new_count += 1
+        patch_lines.append(f"@@ -{old_line},{old_count} +{new_line},{new_count} @@")
+        patch_lines.extend(rendered)
+        old_line += old_count + 10
+        new_line += new_count + 10
+    return "\n".join(patch_lines)
+
+
+def make_file(filename, patch):
+    additions = sum(1 for line in patch.splitlines() if line.startswith("+"))
+    deletions = sum(1 for line in patch.splitlines() if line.startswith("-"))
+    return {
+        "filename": filename,
+        "sha": _sha(filename + patch),
+        "status": "modified",
+        "additions": additions,
+        "deletions": deletions,
+        "changes": additions + deletions,
+        "patch": patch,
+    }
+
+
+def many_files(num_files=300, lines_per_file=40, seed=0):
+    """A PR touching many small files across languages."""
+    rng = random.Random(seed)
+    extensions = list(LANGUAGES)
+    return [
+        make_file(f"src/pkg_{i % 17}/module_{i}{extensions[i % len(extensions)]}",
+                  make_patch(extensions[i % len(extensions)], lines_per_file, rng))
+        for i in range(num_files)
+    ]
+
+
+def large_patches(num_files=4, lines_per_file=20000, seed=1):
+    """A PR with a few very large patches."""
+    rng = random.Random(seed)
+    extensions = list(LANGUAGES)
+    return [
+        make_file(f"generated/big_{i}{extensions[i % len(extensions)]}",
+                  make_patch(extensions[i % len(extensions)], lines_per_file, rng))
+        for i in range(num_files)
+    ]
+
+
+def minified(num_files=3, line_length=50000, seed=2):
+    """Minified assets: one enormous added line per file, heavy on brackets."""
+    rng = random.Random(seed)
+    files = []
+    for i in range(num_files):
+        pieces = []
+        size = 0
+        while size < line_length:
+            piece = rng.choice(["function(a){return a(b(c))}", "{x:[1,2,(3)]}", "var data=", ";if(e){f()}"])
+            pieces.append(piece)
+            size += len(piece)
+        patch = "@@ -1,1 +1,1 @@\n-" + "old();" * 10 + "\n+" + "".join(pieces)
+        files.append(make_file(f"static/js/bundle_{i}.min.js", patch))
+    return files
+
+
+def mixed(seed=3):
+    """A realistic mix: many small files, a few large ones and a minified asset."""
+    return (many_files(num_files=120, lines_per_file=60, seed=seed)
+            + large_patches(num_files=2, lines_per_file=4000, seed=seed)
+            + minified(num_files=1, line_length=20000, seed=seed))
+
+
+SCENARIOS = {
+    "many_files": many_files,
+    "large_patches": large_patches,
+    "minified": minified,
+    "mixed": mixed,
+}
+
+
+def suggestions_for(pr_files, per_file=20, seed=4):
+    """Suggestion dicts spread over the added lines of each file."""
+    rng = random.Random(seed)
+    suggestions = []
+    for file in pr_files:
+        added = [i for i in range(1, file["additions"] + 1)]
+        for line_number in rng.sample(added, min(per_file, len(added))):
+            suggestions.append({
+                "filename": file["filename"],
+                "line_number": line_number,
+                "suggestion_text": "Line exceeds 80 characters.",
+                "suggestion_type": "Line Break Suggestion",
+            })
+    return suggestions
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+from instrumentation import registry
+
+registry.describe("singleflight_calls_total",
+                  "Calls to a single-flight group, by whether they started the computation or joined one in flight.")
+registry.describe("limiter_queue_depth", "Calls waiting for a slot, per limiter.")
+registry.describe("limiter_in_flight", "Calls holding a slot, per limiter.")
+registry.describe("limiter_wait_seconds", "Time calls waited for a slot, per limiter.")
+
+
+class SingleFlight:
+    def __init__(self, name):
+        """
+        Shares one computation among concurrent calls with the same key.
+
+        The first call for a key starts the computation; calls made while it is
+        running wait for the same result, or the same exception, instead of
+        repeating it. Once it finishes, the next call starts afresh. Flights are
+        tracked per process, on the shared event loop.
+
+        Parameters:
+            name (str): Labels the group's metrics.
+        """
+        self.name = name
+        self._flights = {}
+
+    def running(self, key):
+        return key in self._flights
+
+    async def run(self, key, fn, *args):
+        """
+        Awaits `fn(*args)`, or the call already in flight for `key`.
+
+        Returns:
+            The result of the shared call.
+        """
+        future = self._flights.get(key)
+        if future is None:
+            registry.inc("singleflight_calls_total", group=self.name, role="leader")
+            future = asyncio.ensure_future(fn(*args))
+            self._flights[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            registry.inc("singleflight_calls_total", group=self.name, role="joined")
+        # Shielded so a caller that goes away does not cancel the computation for everyone else
+        return await asyncio.shield(future)
+
+    def _finish(self, key, future):
+        self._flights.pop(key, None)
+        if not future.cancelled():
+            # Marks the exception as retrieved even if every caller had gone away
+            future.exception()
+
+
+class Limiter:
+    def __init__(self, name, limit):
+        """
+        Caps the calls to one upstream service in flight at once, across the process.
+
+        Calls over the limit queue in arrival order; the queue depth, the calls
+        in flight and the time spent queued are exported as metrics.
+
+        Parameters:
+            name (str): Labels the limiter's metrics.
+            limit (int): Calls allowed in flight at once.
+        """
+        self.name = name
+        self.limit = limit
+        self.waiting = 0
+        self.active = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __aenter__(self):
+        self.waiting += 1
+        self._report()
+        started = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self._report()
+        registry.observe("limiter_wait_seconds", time.perf_counter() - started, limiter=self.name)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.active -= 1
+        self._semaphore.release()
+        self._report()
+
+    def _report(self):
+        registry.set_gauge("limiter_queue_depth", self.waiting, limiter=self.name)
+        registry.set_gauge("limiter_in_flight", self.active, limiter=self.name)
+
+
+class SharedStream:
+    def __init__(self, source):
+        """
+        Reads an async iterator once and replays it to any number of readers.
+
+        Each reader gets every item from the first one, then follows along as
+        new items arrive. The source is read to the end even if every reader
+        leaves early; an exception from it is raised to every reader.
+
+        Parameters:
+            source: The async iterator to share.
+        """
+        self.items = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for item in source:
+                self.items.append(item)
+                async with self._changed:
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def __aiter__(self):
+        index = 0
+        while True:
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.items) or self.done)
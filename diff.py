@@ -0,0 +1,210 @@
+from array import array
+from collections import OrderedDict
+import os
+import re
+import threading
+
+from instrumentation import record_cache
+
+# Line types are stored as small integers; LINE_TYPES maps them back to the
+# names used by the template and the analyzers.
+ADDITION, DELETION, CONTEXT = 0, 1, 2
+LINE_TYPES = ("addition", "deletion", "context")
+
+# Hunk header like "@@ -190,4 +190,4 @@"; the counts are optional for one-line hunks
+HUNK_HEADER = re.compile(r"@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+# Number of parsed diffs kept, keyed by the file's blob SHA
+DIFF_CACHE_SIZE = int(os.getenv("DIFF_CACHE_SIZE", "1024"))
+
+
+class DiffLine:
+    __slots__ = ("content", "type", "old_line_num", "new_line_num")
+
+    def __init__(self, content, line_type, old_line_num, new_line_num):
+        """
+        A single rendered line of a diff.
+
+        Parameters:
+            content (str): The raw patch line, including its leading marker.
+            line_type (str): "addition", "deletion" or "context".
+            old_line_num (int or str): Line number in the old file, or "" for additions.
+            new_line_num (int or str): Line number in the new file, or "" for deletions.
+        """
+        self.content = content
+        self.type = line_type
+        self.old_line_num = old_line_num
+        self.new_line_num = new_line_num
+
+    def to_dict(self):
+        return {
+            "content": self.content,
+            "type": self.type,
+            "old_line_num": self.old_line_num,
+            "new_line_num": self.new_line_num
+        }
+
+
+class ParsedDiff:
+    """
+    A patch parsed once into parallel arrays.
+
+    Line types and line numbers live in compact arrays (0 means "no line
+    number"), so a diff costs a few bytes per line on top of its text.
+    DiffLine objects and hunk views are only built when something iterates.
+    """
+
+    __slots__ = ("patch", "contents", "types", "old_nums", "new_nums", "hunk_starts")
+
+    def __init__(self, patch):
+        self.patch = patch
+        self.contents = []
+        self.types = array("b")
+        self.old_nums = array("i")
+        self.new_nums = array("i")
+        self.hunk_starts = array("i")
+        self._parse(patch)
+
+    def _parse(self, patch):
+        contents = self.contents
+        types = self.types
+        old_nums = self.old_nums
+        new_nums = self.new_nums
+        old_line_num = 0
+        new_line_num = 0
+
+        for line in patch.splitlines():
+            marker = line[:1]
+            if marker == "+":
+                new_line_num += 1
+                types.append(ADDITION)
+                old_nums.append(0)
+                new_nums.append(new_line_num)
+            elif marker == "-":
+                old_line_num += 1
+                types.append(DELETION)
+                old_nums.append(old_line_num)
+                new_nums.append(0)
+            elif marker == "@" and line.startswith("@@"):
+                header_match = HUNK_HEADER.match(line)
+                if header_match:
+                    # Set initial line numbers from the header and skip it in the output
+                    old_line_num = int(header_match.group(1)) - 1
+                    new_line_num = int(header_match.group(2)) - 1
+                    self.hunk_starts.append(len(contents))
+                    continue
+                old_line_num += 1
+                new_line_num += 1
+                types.append(CONTEXT)
+                old_nums.append(old_line_num)
+                new_nums.append(new_line_num)
+            elif marker == "\\" and line.strip() == "\\ No newline at end of file":
+                continue
+            else:
+                old_line_num += 1
+                new_line_num += 1
+                types.append(CONTEXT)
+                old_nums.append(old_line_num)
+                new_nums.append(new_line_num)
+            contents.append(line)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __getitem__(self, index):
+        return DiffLine(
+            self.contents[index],
+            LINE_TYPES[self.types[index]],
+            self.old_nums[index] or "",
+            self.new_nums[index] or ""
+        )
+
+    def __iter__(self):
+        return self.iter_lines(0, len(self.contents))
+
+    def iter_lines(self, start, end):
+        contents = self.contents
+        types = self.types
+        old_nums = self.old_nums
+        new_nums = self.new_nums
+        for index in range(start, end):
+            yield DiffLine(contents[index], LINE_TYPES[types[index]],
+                           old_nums[index] or "", new_nums[index] or "")
+
+    @property
+    def hunks(self):
+        """Lazy views over each hunk; no lines are copied."""
+        bounds = list(self.hunk_starts) or [0]
+        ends = bounds[1:] + [len(self.contents)]
+        return [Hunk(self, start, end) for start, end in zip(bounds, ends)]
+
+    def additions(self):
+        """Yields (new_line_num, text) for every added line, without the leading '+'."""
+        contents = self.contents
+        new_nums = self.new_nums
+        for index, line_type in enumerate(self.types):
+            if line_type == ADDITION:
+                yield new_nums[index], contents[index][1:]
+
+    def added_content(self):
+        """The added lines joined back into a source snippet for static analysis."""
+        return "\n".join(text for _, text in self.additions())
+
+
+class Hunk:
+    __slots__ = ("diff", "start", "end")
+
+    def __init__(self, diff, start, end):
+        self.diff = diff
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __iter__(self):
+        return self.diff.iter_lines(self.start, self.end)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_patch(patch, sha=None):
+    """
+    Parses a patch, reusing an earlier parse of the same blob when possible.
+
+    Parameters:
+        patch (str): The unified diff text from the GitHub files API.
+        sha (str): The file's blob SHA, used as the cache key.
+
+    Returns:
+        ParsedDiff: The parsed diff.
+    """
+    if sha is None:
+        return ParsedDiff(patch)
+
+    with _cache_lock:
+        cached = _cache.get(sha)
+        # The same blob can come with a different patch against another base
+        if cached is not None and cached.patch == patch:
+            _cache.move_to_end(sha)
+            record_cache("diff", True)
+            return cached
+
+    record_cache("diff", False)
+    parsed = ParsedDiff(patch)
+    with _cache_lock:
+        _cache[sha] = parsed
+        _cache.move_to_end(sha)
+        while len(_cache) > DIFF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
+
+
+def parse_file(file):
+    """Returns the ParsedDiff for a PR file dict, or None if it has no patch."""
+    patch = file.get("patch")
+    if not patch:
+        return None
+    return parse_patch(patch, file.get("sha"))
@@ -0,0 +1,93 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Files scored at least this important (or flagged vulnerable) start expanded; the rest load when opened
+DIFF_EXPAND_MIN_IMPORTANCE = int(os.getenv("DIFF_EXPAND_MIN_IMPORTANCE", "4"))
+# Diff lines rendered per request for one file; the rest are loaded a window at a time
+DIFF_WINDOW_LINES = int(os.getenv("DIFF_WINDOW_LINES", "100"))
+# Diff lines rendered inline across a page of files; once spent, further files start collapsed
+DIFF_INLINE_MAX_LINES = int(os.getenv("DIFF_INLINE_MAX_LINES", "1000"))
+# Files rendered per page of the file list
+INSIGHTS_FILES_PAGE = int(os.getenv("INSIGHTS_FILES_PAGE", "100"))
+# Longer lines (minified code, data) are cut off in the diff view
+DIFF_LINE_MAX_CHARS = int(os.getenv("DIFF_LINE_MAX_CHARS", "500"))
+
+
+class FileView:
+    __slots__ = ("file", "expanded", "end")
+
+    def __init__(self, file, expanded, end):
+        """
+        How one file is first shown on the page.
+
+        Parameters:
+            file (dict): The PR file, with its parsed diff in `lines`.
+            expanded (bool): Whether it starts open with its first window of lines.
+            end (int): Index of the first diff line not rendered inline.
+        """
+        self.file = file
+        self.expanded = expanded
+        self.end = end
+
+    @property
+    def total(self):
+        lines = self.file.get("lines")
+        return len(lines) if lines is not None else 0
+
+
+def is_important(file):
+    return file.get("is_vulnerable") or file.get("importance_score", 0) >= DIFF_EXPAND_MIN_IMPORTANCE
+
+
+def file_views(pr_files, offset=0, scores_pending=False):
+    """
+    Lays out one page of the file list so the page stays small however large the PR is.
+
+    Files are taken in review order. Important files are expanded with their
+    first DIFF_WINDOW_LINES lines until DIFF_INLINE_MAX_LINES have been spent;
+    every other file starts collapsed and is fetched when opened. While scores
+    are pending, every file counts as important.
+
+    Parameters:
+        pr_files (list): The PR's files in review order.
+        offset (int): Index of the first file on the page.
+        scores_pending (bool): Whether the files have no scores yet.
+
+    Returns:
+        tuple: (views, next_offset), where next_offset is None on the last page.
+    """
+    page = pr_files[offset:offset + INSIGHTS_FILES_PAGE]
+    budget = DIFF_INLINE_MAX_LINES
+    views = []
+    for file in page:
+        lines = file.get("lines")
+        window = min(len(lines), DIFF_WINDOW_LINES) if lines is not None else 0
+        expanded = (scores_pending or is_important(file)) and 0 < window <= budget
+        if expanded:
+            budget -= window
+        views.append(FileView(file, expanded, window if expanded else 0))
+    next_offset = offset + len(page)
+    return views, (next_offset if next_offset < len(pr_files) else None)
+
+
+def diff_window(file, start):
+    """
+    The diff lines of a file from `start`, at most DIFF_WINDOW_LINES of them.
+
+    Returns:
+        tuple: (lines, end), where end is the index after the last line returned.
+    """
+    parsed = file["lines"]
+    start = max(0, min(start, len(parsed)))
+    end = min(len(parsed), start + DIFF_WINDOW_LINES)
+    return parsed.iter_lines(start, end), end
+
+
+def clip_line(text, limit=DIFF_LINE_MAX_CHARS):
+    """Template filter cutting a diff line down to `limit` characters."""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… ({len(text) - limit:,} more characters)"
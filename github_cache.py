@@ -0,0 +1,181 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class CacheEntry:
+    __slots__ = ("etag", "last_modified", "links", "data", "size")
+
+    def __init__(self, etag, last_modified, links, data, size):
+        """
+        A cached GitHub API response.
+
+        Parameters:
+            etag (str): The `ETag` header of the response, if any.
+            last_modified (str): The `Last-Modified` header of the response, if any.
+            links (dict): The parsed `Link` header, so pagination survives a 304.
+            data: The decoded JSON body.
+            size (int): Size of the raw body in bytes, used for eviction.
+        """
+        self.etag = etag
+        self.last_modified = last_modified
+        self.links = links
+        self.data = data
+        self.size = size
+
+    def conditional_headers(self):
+        """Headers that turn the next request for this resource into a conditional one."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class MemoryCache:
+    """In-process LRU cache bounded by the total size of the cached bodies."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+            self._entries[key] = entry
+            self.total_bytes += entry.size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+
+
+class DiskCache:
+    """
+    Directory-backed cache that can be shared by every gunicorn worker on a host.
+
+    Each entry is one JSON file written atomically, so concurrent workers never
+    see a partial entry. When the directory grows past max_bytes the least
+    recently written entries are removed.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            body = stored["body"]
+            links = stored["links"]
+            if not isinstance(links, dict):
+                return None
+            return CacheEntry(stored["etag"], stored["last_modified"], links, json.loads(body), len(body))
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing, or not in the shape set() writes; either way it is a miss and is fetched again
+            return None
+
+    def set(self, key, entry, body):
+        stored = {
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "links": entry.links,
+            "body": body,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._enforce_size()
+
+    def _enforce_size(self):
+        try:
+            files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+            stats = [(entry.stat(), entry.path) for entry in files]
+        except OSError:
+            return
+        total = sum(stat.st_size for stat, _ in stats)
+        if total <= self.max_bytes:
+            return
+        # Oldest entries go first
+        for stat, path in sorted(stats, key=lambda item: item[0].st_mtime):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= stat.st_size
+            if total <= self.max_bytes:
+                break
+
+
+class ResponseCache:
+    """Memory cache with an optional disk cache behind it."""
+
+    def __init__(self, max_bytes, directory=None, disk_max_bytes=None):
+        self.memory = MemoryCache(max_bytes)
+        self.disk = DiskCache(directory, disk_max_bytes or max_bytes * 4) if directory else None
+
+    @staticmethod
+    def key(url, params=None):
+        query = "&".join(f"{name}={value}" for name, value in sorted((params or {}).items()))
+        return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    def store(self, key, response, data):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            # Nothing to revalidate against, so caching would never pay off
+            return
+        body = response.text
+        entry = CacheEntry(etag, last_modified, dict(response.links), data, len(body))
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry, body)
+
+
+def detach(data):
+    """
+    Returns a copy of a cached body that callers may mutate freely.
+
+    Callers only add or replace top-level keys on the PR, repo and file dicts,
+    so copying one level deep is enough and far cheaper than decoding again.
+    """
+    if isinstance(data, list):
+        return [dict(item) if isinstance(item, dict) else item for item in data]
+    if isinstance(data, dict):
+        return dict(data)
+    return data
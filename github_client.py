@@ -0,0 +1,257 @@
+from urllib.parse import parse_qs, urlparse
+from dotenv import load_dotenv
+import asyncio
+import httpx
+import os
+import time
+
+import async_runtime
+from concurrency import Limiter, SingleFlight
+from github_cache import ResponseCache, detach
+from github_tokens import TokenPool
+from instrumentation import record_cache, record_github_response, registry
+
+load_dotenv()
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# A comma-separated pool of tokens; requests go to whichever has the most left
+GITHUB_TOKENS = [token.strip() for token in os.getenv("GITHUB_TOKENS", "").split(",") if token.strip()]
+
+# Longest a request waits for a rate limit to reset before failing
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "300"))
+# Retries for server and network errors; rate-limited requests wait instead
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+GITHUB_BACKOFF_BASE = float(os.getenv("GITHUB_BACKOFF_BASE", "1"))
+GITHUB_BACKOFF_CAP = float(os.getenv("GITHUB_BACKOFF_CAP", "60"))
+
+# GitHub allows at most 100 items per page on list endpoints
+PER_PAGE = 100
+# Number of concurrent connections kept alive to the API host
+FETCH_WORKERS = int(os.getenv("GITHUB_FETCH_WORKERS", "8"))
+# GitHub requests in flight at once across the process; the rest queue for a slot
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", str(FETCH_WORKERS)))
+
+# Conditional-request cache; a 304 does not count against the rate limit
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+GITHUB_CACHE_DIR = os.getenv("GITHUB_CACHE_DIR")
+
+response_cache = ResponseCache(GITHUB_CACHE_MAX_BYTES, GITHUB_CACHE_DIR)
+token_pool = TokenPool(GITHUB_TOKENS or ([GITHUB_TOKEN] if GITHUB_TOKEN else []),
+                       GITHUB_BACKOFF_BASE, GITHUB_BACKOFF_CAP)
+github_limiter = Limiter("github", GITHUB_MAX_CONCURRENCY)
+# Identical GETs made at the same time, e.g. several people opening one PR, share a single request
+github_flights = SingleFlight("github")
+
+registry.describe("github_retries_total", "GitHub requests retried, by reason.")
+registry.describe("github_token_wait_seconds", "Time requests waited for a GitHub token under its rate limit.")
+
+
+class GitHubError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimitError(GitHubError):
+    pass
+
+_client = None
+
+
+def get_client():
+    """
+    The keep-alive HTTP client shared by every request so we reuse TLS connections.
+
+    It is created on first use, on the shared event loop it will run on.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers={"Accept": "application/vnd.github+json"},
+            limits=httpx.Limits(max_connections=FETCH_WORKERS, max_keepalive_connections=FETCH_WORKERS),
+            timeout=httpx.Timeout(30.0)
+        )
+    return _client
+
+
+def _is_rate_limited(response):
+    if response.status_code == 429:
+        return True
+    # GitHub answers 403 for both primary and secondary rate limits
+    return response.status_code == 403 and (
+        response.headers.get("X-RateLimit-Remaining") == "0"
+        or "Retry-After" in response.headers
+        or "rate limit" in response.text.lower()
+    )
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def send(url, params=None, headers=None):
+    """
+    Sends a GET with a token from the pool, waiting out rate limits.
+
+    Rate-limited requests bench their token and go back in the queue for the
+    next usable one, until GITHUB_RATE_LIMIT_MAX_WAIT has passed. Server and
+    network errors are retried up to GITHUB_MAX_RETRIES times with jittered
+    exponential backoff.
+
+    Returns:
+        httpx.Response: The first response that is not a rate limit or server error.
+
+    Raises:
+        RateLimitError: If no token frees up in time.
+        GitHubError: If the server or network errors persist.
+    """
+    deadline = time.time() + GITHUB_RATE_LIMIT_MAX_WAIT
+    path = urlparse(url).path
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        token = await token_pool.acquire(deadline)
+        registry.observe("github_token_wait_seconds", time.perf_counter() - started)
+        if token is None:
+            raise RateLimitError(f"GitHub rate limit exceeded for {path}", 429)
+
+        try:
+            async with github_limiter:
+                response = await get_client().get(url, params=params,
+                                                  headers=dict(headers or {}, **token.headers()))
+        except httpx.TransportError as e:
+            error = GitHubError(f"Could not reach GitHub for {path}: {e}")
+            reason = "network"
+        else:
+            record_github_response(response, token.index)
+            token_pool.update(token, response)
+            if _is_rate_limited(response):
+                token_pool.penalize(token, _retry_after(response))
+                registry.inc("github_retries_total", reason="rate_limit")
+                continue
+            if response.status_code == 401 and token_pool.disable(token):
+                print(f"GitHub rejected token #{token.index}; leaving it out of the pool.")
+                registry.inc("github_retries_total", reason="bad_token")
+                continue
+            if response.status_code < 500:
+                token_pool.succeeded(token)
+                return response
+            error = GitHubError(f"GitHub returned {response.status_code} for {path}", response.status_code)
+            reason = "server_error"
+
+        if attempt >= GITHUB_MAX_RETRIES:
+            raise error
+        registry.inc("github_retries_total", reason=reason)
+        await asyncio.sleep(token_pool.backoff(attempt))
+        attempt += 1
+
+
+async def get_json(url, params=None):
+    """
+    Fetches a single GitHub API resource, revalidating any cached copy.
+
+    A cached body is sent back to GitHub as `If-None-Match`/`If-Modified-Since`;
+    on a 304 the cached body is returned without transferring or decoding it.
+    Concurrent calls for the same resource share one request.
+
+    Returns:
+        tuple: (data, links), where links is the parsed Link header.
+
+    Raises:
+        GitHubError: If the resource could not be fetched.
+    """
+    key = response_cache.key(url, params)
+    data, links = await github_flights.run(key, _fetch_json, key, url, params)
+    # Every caller gets its own copy of the shared body
+    return detach(data), links
+
+
+async def _fetch_json(key, url, params):
+    # The cache may spill to disk, so it is used off the event loop
+    cached = await async_runtime.run_io(response_cache.get, key)
+    headers = cached.conditional_headers() if cached is not None else None
+
+    response = await send(url, params=params, headers=headers)
+    if cached is not None:
+        record_cache("github", response.status_code == 304)
+    if response.status_code == 304 and cached is not None:
+        return cached.data, cached.links
+    if response.status_code == 404:
+        raise GitHubError(f"Not found on GitHub: {urlparse(url).path}", 404)
+    if response.status_code != 200:
+        raise GitHubError(f"GitHub returned {response.status_code} for {urlparse(url).path}", response.status_code)
+
+    data = response.json()
+    await async_runtime.run_io(response_cache.store, key, response, data)
+    return data, response.links
+
+
+def _last_page(links):
+    """Reads the page number of the `last` relation from a parsed Link header."""
+    last = links.get("last")
+    if not last:
+        return 1
+    page = parse_qs(urlparse(last["url"]).query).get("page")
+    return int(page[0]) if page else 1
+
+
+async def get_paginated(url, params=None):
+    """
+    Fetches every page of a GitHub list endpoint.
+
+    The first page is fetched on its own to learn the total page count from the
+    Link header; the remaining pages are then fetched concurrently and stitched
+    back together in order.
+
+    Returns:
+        list: All items across pages.
+
+    Raises:
+        GitHubError: If any page could not be fetched, rather than returning a partial list.
+    """
+    params = dict(params or {}, per_page=PER_PAGE)
+    first_page, links = await get_json(url, params=dict(params, page=1))
+
+    last_page = _last_page(links)
+    if last_page <= 1:
+        return first_page
+
+    pages = await asyncio.gather(*(
+        get_json(url, dict(params, page=page))
+        for page in range(2, last_page + 1)
+    ))
+
+    items = list(first_page)
+    for page_items, _ in pages:
+        items.extend(page_items)
+    return items
+
+
+async def get_pr_data_async(owner, repo, pr_number):
+    data, _ = await get_json(f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}")
+    return data
+
+
+async def get_repo_data_async(owner, repo):
+    data, _ = await get_json(f"{GITHUB_API_URL}/repos/{owner}/{repo}")
+    return data
+
+
+async def get_pr_file_list_async(owner, repo, pr_number):
+    return await get_paginated(f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}/files")
+
+
+async def get_compare_async(owner, repo, base, head):
+    """Compares two commits; the result lists the files that differ, with their blob SHAs."""
+    data, _ = await get_json(f"{GITHUB_API_URL}/repos/{owner}/{repo}/compare/{base}...{head}")
+    return data
+
+
+def get_pr_file_list(owner, repo, pr_number):
+    """Blocking form of get_pr_file_list_async for request threads; the work still runs on the shared loop."""
+    return async_runtime.run(get_pr_file_list_async(owner, repo, pr_number))
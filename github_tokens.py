@@ -0,0 +1,133 @@
+import asyncio
+import random
+import time
+
+
+class TokenState:
+    __slots__ = ("index", "token", "remaining", "reset_at", "blocked_until", "failures")
+
+    def __init__(self, index, token):
+        """
+        What we know about one token's rate limit, from the latest response made with it.
+
+        Parameters:
+            index (int): Position in the pool, used to label metrics without exposing the token.
+            token (str): The token, or None for unauthenticated requests.
+        """
+        self.index = index
+        self.token = token
+        self.remaining = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        self.failures = 0
+
+    def headers(self):
+        return {"Authorization": f"token {self.token}"} if self.token else {}
+
+    def available_at(self):
+        """Wall-clock time from which the token may be used again."""
+        if self.remaining == 0:
+            return max(self.blocked_until, self.reset_at)
+        return self.blocked_until
+
+
+class TokenPool:
+    def __init__(self, tokens, backoff_base=1.0, backoff_cap=60.0):
+        """
+        Spreads GitHub requests over several tokens, keeping each within its rate limit.
+
+        Every request takes the token with the most requests left. A token that
+        is out of requests, or that was told to slow down, is benched until its
+        reset or Retry-After time. When all tokens are benched, requests wait
+        for the first one to come back instead of failing.
+
+        Parameters:
+            tokens (list): Token strings; an empty list makes unauthenticated requests.
+            backoff_base (float): Seconds to back off after a first rate-limit response with no reset time.
+            backoff_cap (float): Longest such backoff, reached by doubling on repeated responses.
+        """
+        self.tokens = [TokenState(index, token) for index, token in enumerate(tokens or [None])]
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def _best(self):
+        # Soonest available first, then the most requests left (unknown counts as most)
+        return min(self.tokens, key=lambda state: (
+            state.available_at(),
+            -(state.remaining if state.remaining is not None else float("inf"))
+        ))
+
+    async def acquire(self, deadline):
+        """
+        Waits for a usable token.
+
+        Parameters:
+            deadline (float): Wall-clock time after which to give up.
+
+        Returns:
+            TokenState or None: The token to use, or None if none frees up before the deadline.
+        """
+        while True:
+            state = self._best()
+            now = time.time()
+            wait = state.available_at() - now
+            if wait <= 0:
+                if state.remaining:
+                    # Count the request now so concurrent requests spread over the pool
+                    state.remaining -= 1
+                return state
+            if now + wait > deadline:
+                return None
+            # Jitter keeps queued requests from all retrying in the same instant
+            await asyncio.sleep(wait + random.uniform(0, self.backoff_base))
+
+    def update(self, state, response):
+        """Records the rate-limit headers of a response made with the token."""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None:
+            state.remaining = int(remaining)
+        if reset is not None:
+            state.reset_at = float(reset)
+
+    def succeeded(self, state):
+        state.failures = 0
+
+    def penalize(self, state, retry_after=None):
+        """
+        Benches a token after a rate-limit response.
+
+        Retry-After is honoured when present, then the reset time of an
+        exhausted primary limit. Otherwise (a secondary limit with no hint) the
+        token backs off for a random time below a ceiling that doubles with
+        each consecutive rate-limit response.
+
+        Returns:
+            float: Seconds the token is benched for.
+        """
+        state.failures += 1
+        now = time.time()
+        if retry_after is not None:
+            delay = retry_after
+        elif state.remaining == 0 and state.reset_at > now:
+            delay = state.reset_at - now
+        else:
+            ceiling = min(self.backoff_cap, self.backoff_base * 2 ** state.failures)
+            delay = random.uniform(ceiling / 2, ceiling)
+        state.blocked_until = max(state.blocked_until, now + delay)
+        return delay
+
+    def disable(self, state):
+        """Takes a token that GitHub rejected out of the pool, as long as another one is left."""
+        usable = [other for other in self.tokens if other.blocked_until != float("inf")]
+        if len(usable) <= 1 or state not in usable:
+            return False
+        state.blocked_until = float("inf")
+        return True
+
+    def backoff(self, attempt):
+        """Delay before retrying a server or network error, with full jitter."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
@@ -0,0 +1,390 @@
+from collections import Counter, defaultdict
+from collections.abc import Coroutine
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Requests slower than this many milliseconds get a sampled profile written to
+# PROFILE_DIR; profiling is off when unset
+PROFILE_THRESHOLD_MS = os.getenv("PROFILE_THRESHOLD_MS")
+PROFILING = bool(PROFILE_THRESHOLD_MS)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Histogram buckets in seconds, from a cache hit to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ""
+    rendered = ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in pairs)
+    return "{" + rendered + "}"
+
+
+class Registry:
+    """
+    Process-wide counters, gauges and histograms, exposed in Prometheus text format.
+
+    Each gunicorn worker keeps its own registry; scrape every worker or sum
+    the series in Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = defaultdict(dict)
+        self._gauges = defaultdict(dict)
+        self._histograms = defaultdict(dict)
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[name][_label_key(labels)] = value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def get(self, name, **labels):
+        """Current value of a counter or gauge, mostly for tests and debugging."""
+        key = _label_key(labels)
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name].get(key, 0)
+            return self._gauges.get(name, {}).get(key)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in series.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+registry.describe("insights_stage_seconds", "Time spent in each stage of an analysis.")
+registry.describe("http_request_seconds", "Request latency by endpoint.")
+registry.describe("llm_requests_total", "Completions requested from the LLM.")
+registry.describe("llm_tokens_total", "LLM tokens used, by purpose and kind.")
+registry.describe("cache_requests_total", "Cache lookups by cache and result (hit or miss).")
+registry.describe("github_requests_total", "GitHub API requests by response status.")
+registry.describe("github_rate_limit_remaining", "X-RateLimit-Remaining from the latest GitHub response, per token.")
+registry.describe("github_rate_limit_limit", "X-RateLimit-Limit from the latest GitHub response, per token.")
+
+
+def record_cache(cache, hit):
+    registry.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_usage(purpose, completion):
+    """Counts a completion and its token usage, when the response reports it."""
+    registry.inc("llm_requests_total", purpose=purpose)
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return
+    registry.inc("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, purpose=purpose, kind="prompt")
+    registry.inc("llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, purpose=purpose, kind="completion")
+
+
+def record_github_response(response, token_index=0):
+    registry.inc("github_requests_total", status=response.status_code)
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    limit = response.headers.get("X-RateLimit-Limit")
+    # Tokens are labelled by their position in GITHUB_TOKENS, never by value
+    if remaining is not None:
+        registry.set_gauge("github_rate_limit_remaining", int(remaining), token=token_index)
+    if limit is not None:
+        registry.set_gauge("github_rate_limit_limit", int(limit), token=token_index)
+
+
+class RequestTimer:
+    """
+    Collects the stage timings of one request for its Server-Timing header.
+
+    Stages may run on worker threads or the event loop; stage() times a block
+    and measure() times a coroutine, recording each against this request.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            registry.observe("insights_stage_seconds", duration, stage=name)
+            with self._lock:
+                self.stages.append((name, duration))
+
+    async def measure(self, name, awaitable):
+        with self.stage(name):
+            return await awaitable
+
+    def server_timing(self):
+        with self._lock:
+            stages = list(self.stages)
+        total = time.perf_counter() - self.started
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in stages]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# The profile each thread is currently working for, by thread id
+_thread_profiles = {}
+# The profile of the request a context belongs to; copied into the event loop's
+# tasks and, through attributed(), into executor calls
+_current_profile = contextvars.ContextVar("current_profile", default=None)
+_sampler_lock = threading.Lock()
+_sampler_thread = None
+_active_profiles = 0
+_sampling = threading.Event()
+
+
+class SamplingProfiler:
+    """
+    The sampled stacks of one request, from every thread that works for it.
+
+    One shared sampler thread takes a sample every PROFILE_INTERVAL_MS while
+    any request is being profiled, and only of the threads attributed to a
+    profiled request: the request's own thread, event-loop tasks it started
+    and executor calls made from them. Other requests' stacks never end up in
+    this profile, and the cost follows the threads at work for profiled
+    requests rather than every thread in the process.
+
+    Samples are kept as folded stacks ("outer;inner;leaf count"), the input
+    format of flamegraph tools.
+    """
+
+    def __init__(self):
+        self.samples = Counter()
+        self._outer = None
+        self._previous = None
+
+    def start(self):
+        """Starts profiling the calling thread and the work it hands to the event loop and executors."""
+        global _active_profiles, _sampler_thread
+        with _sampler_lock:
+            _active_profiles += 1
+            _sampling.set()
+            if _sampler_thread is None:
+                _sampler_thread = threading.Thread(target=_sample, daemon=True, name="sampling-profiler")
+                _sampler_thread.start()
+        self._outer = _current_profile.get()
+        _current_profile.set(self)
+        self._previous = _attach(self)
+        return self
+
+    def stop(self):
+        global _active_profiles
+        _detach(self._previous)
+        _current_profile.set(self._outer)
+        with _sampler_lock:
+            _active_profiles -= 1
+            if not _active_profiles:
+                _sampling.clear()
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _attach(profile):
+    """Attributes the calling thread's work to profile; returns what it was attributed to before."""
+    ident = threading.get_ident()
+    previous = _thread_profiles.get(ident)
+    _thread_profiles[ident] = profile
+    return previous
+
+
+def _detach(previous):
+    ident = threading.get_ident()
+    if previous is None:
+        _thread_profiles.pop(ident, None)
+    else:
+        _thread_profiles[ident] = previous
+
+
+def _sample():
+    interval = PROFILE_INTERVAL_MS / 1000.0
+    while True:
+        _sampling.wait()
+        time.sleep(interval)
+        # Copied at once, as threads attach and detach while the stacks are walked
+        owners = dict(_thread_profiles)
+        frames = sys._current_frames()
+        for thread_id, profile in owners.items():
+            frame = frames.get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                profile.samples[";".join(reversed(stack))] += 1
+
+
+def attributed(fn):
+    """
+    Wraps fn so that, run on an executor thread, its samples count toward the calling request's profile.
+
+    Returns fn itself when the caller is not being profiled.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return fn
+
+    def call(*args):
+        previous = _attach(profile)
+        try:
+            return fn(*args)
+        finally:
+            _detach(previous)
+    return call
+
+
+class _ProfiledCoroutine(Coroutine):
+    """Runs each step of a coroutine with the event-loop thread attributed to a profile."""
+
+    def __init__(self, coro, profile):
+        self.coro = coro
+        self.profile = profile
+
+    def send(self, value):
+        previous = _attach(self.profile)
+        try:
+            return self.coro.send(value)
+        finally:
+            _detach(previous)
+
+    def throw(self, *args):
+        previous = _attach(self.profile)
+        try:
+            return self.coro.throw(*args)
+        finally:
+            _detach(previous)
+
+    def close(self):
+        return self.coro.close()
+
+    def __await__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def __getattr__(self, name):
+        return getattr(self.coro, name)
+
+
+def profiled_task_factory(loop, coro, context=None):
+    """
+    Task factory for the event loop that attributes each task of a profiled request to its profile.
+
+    Tasks inherit the context they are created in, so the coroutines a request
+    runs on the loop, and the tasks they start in turn, carry its profile.
+    """
+    profile = (context or contextvars.copy_context()).get(_current_profile)
+    if profile is not None:
+        coro = _ProfiledCoroutine(coro, profile)
+    if context is None:
+        return asyncio.Task(coro, loop=loop)
+    return asyncio.Task(coro, loop=loop, context=context)
+
+
+def init_app(app):
+    """Adds per-request timing, the Server-Timing header and optional slow-request profiling."""
+    from flask import g, request
+
+    threshold = float(PROFILE_THRESHOLD_MS) / 1000.0 if PROFILE_THRESHOLD_MS else None
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # after_request is skipped when a request fails, but its profile must still stop
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_timer = RequestTimer()
+        g.profiler = SamplingProfiler().start() if threshold is not None else None
+
+    @app.after_request
+    def finish_request_timer(response):
+        timer = g.pop("request_timer", None)
+        profiler = g.pop("profiler", None)
+        if timer is None:
+            return response
+
+        elapsed = time.perf_counter() - timer.started
+        registry.observe("http_request_seconds", elapsed, endpoint=request.endpoint or "unknown")
+        response.headers["Server-Timing"] = timer.server_timing()
+
+        if profiler is not None:
+            profiler.stop()
+            if elapsed > threshold:
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{int(elapsed * 1000)}ms.folded"
+                profiler.dump(os.path.join(PROFILE_DIR, name))
+        return response
+
+
+def request_timer():
+    """The current request's RequestTimer, or a throwaway one outside a request."""
+    from flask import g, has_request_context
+
+    if has_request_context() and "request_timer" in g:
+        return g.request_timer
+    return RequestTimer()
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+import asyncio
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from dotenv import load_dotenv
+
+import async_runtime
+from instrumentation import registry
+
+load_dotenv()
+
+# Analyses running at once in the background, per worker process; they mostly
+# wait on GitHub and OpenAI, so many can share the event loop
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "16"))
+# Jobs allowed to wait for a free worker before new ones are turned away
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "32"))
+# Finished jobs kept for their result pages; queued and running jobs are always kept
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "50"))
+
+registry.describe("jobs_queued", "Background jobs waiting for a worker.")
+registry.describe("jobs_running", "Background jobs currently running.")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, owner, repo, pr_number):
+        """
+        A background analysis of one PR whose results are published one section at a time.
+
+        Each published section carries a version number, so a poller can ask
+        only for the sections that changed since its last poll.
+
+        Parameters:
+            owner (str): Owner of the PR's repository.
+            repo (str): Name of the PR's repository.
+            pr_number (int or str): The PR number.
+        """
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.repo = repo
+        self.pr_number = int(pr_number)
+        self.status = "queued"
+        self.error = None
+        self.created = time.time()
+        self.sections = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def publish(self, name, value):
+        with self._lock:
+            self.version += 1
+            self.sections[name] = (self.version, value)
+
+    def finish(self, status, error=None):
+        with self._lock:
+            self.version += 1
+            self.status = status
+            self.error = error
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def changes_since(self, version):
+        """Sections published after the given version, as {name: value}."""
+        with self._lock:
+            return {name: value for name, (section_version, value) in self.sections.items()
+                    if section_version > version}
+
+
+_slots = asyncio.Semaphore(JOB_WORKERS)
+_jobs = OrderedDict()
+# Futures of submitted jobs, so their tasks are not garbage collected mid-run
+_futures = set()
+_jobs_lock = threading.Lock()
+_pending = 0
+_running = 0
+
+
+def _evict_finished():
+    # Oldest finished jobs first; a job still in progress must stay so its page can poll it
+    finished = [job_id for job_id, job in _jobs.items() if job.done]
+    for job_id in finished[:max(0, len(finished) - JOB_RETENTION)]:
+        del _jobs[job_id]
+
+
+async def _run(job, fn, args):
+    global _pending, _running
+    async with _slots:
+        with _jobs_lock:
+            _pending -= 1
+            _running += 1
+            registry.set_gauge("jobs_queued", _pending)
+            registry.set_gauge("jobs_running", _running)
+        job.status = "running"
+        try:
+            await fn(job, job.owner, job.repo, job.pr_number, *args)
+            job.finish("done")
+        except Exception as e:
+            traceback.print_exc()
+            job.finish("error", str(e))
+        finally:
+            with _jobs_lock:
+                _running -= 1
+                registry.set_gauge("jobs_running", _running)
+                # Kept in the order jobs finished, so a long job is not the first evicted once done
+                if job.id in _jobs:
+                    _jobs.move_to_end(job.id)
+                _evict_finished()
+
+
+def submit(fn, owner, repo, pr_number, *args):
+    """
+    Schedules the coroutine fn(job, owner, repo, pr_number, *args) on the shared event loop.
+
+    Returns:
+        Job: The job, at once; it runs when a worker slot is free.
+
+    Raises:
+        JobQueueFull: If JOB_QUEUE_LIMIT jobs are already waiting.
+    """
+    global _pending
+    job = Job(owner, repo, pr_number)
+    with _jobs_lock:
+        if _pending >= JOB_QUEUE_LIMIT:
+            raise JobQueueFull()
+        _pending += 1
+        registry.set_gauge("jobs_queued", _pending)
+        _jobs[job.id] = job
+        _evict_finished()
+    future = async_runtime.submit(_run(job, fn, args))
+    _futures.add(future)
+    future.add_done_callback(_futures.discard)
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -1,91 +1,43 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, redirect, render_template, request, stream_with_context, url_for
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
-import requests
+import json
 import os
-import re
 
-from ai import get_summary, get_scores
-from suggestions import get_suggestions
+import async_runtime
+import jobs
+import webhooks
+from ai import render_summary, stream_summary_html
+from analysis import (API_BATCH_CONCURRENCY, API_BATCH_MAX_PRS, AnalysisProgress, analyze_batch, analyze_pr,
+                      analyze_pr_result, load_analysis, parse_pr_url, pr_context, repository_result)
+from diff_view import clip_line, diff_window, file_views
+from instrumentation import RequestTimer, init_app, registry, request_timer
+from github_client import GitHubError, RateLimitError, get_pr_file_list
+from suggestions import index_suggestions
 
 
 load_dotenv()
 
+# Run /insights analyses as background jobs with a progressively filled page
+INSIGHTS_JOB_MODE = os.getenv("INSIGHTS_JOB_MODE", "0") == "1"
+# Stream the summary to the page separately instead of waiting for it before rendering
+SUMMARY_STREAMING = os.getenv("SUMMARY_STREAMING", "1") == "1"
+
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
+init_app(app)
+# The file list lays itself out in the templates, so every page and fragment pages it the same way
+app.add_template_global(file_views)
+app.add_template_global(diff_window)
+app.add_template_filter(clip_line)
 
-GITHUB_API_URL = "https://api.github.com"
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-HEADERS = {"Authorization": f"token {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}
-
-def get_pr_files(owner, repo, pr_number):
-    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}/files"
-    response = requests.get(url, headers=HEADERS)
-    files_data = response.json() if response.status_code == 200 else {"error": "PR data not found"}
-
-    # Process line numbers for each file's patch
-    for file in files_data:
-        if "patch" in file:
-            file["lines"] = process_patch(file["patch"])
-
-    return files_data
-
-def get_pr_data(owner, repo, pr_number):
-    pr_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
-    response = requests.get(pr_url, headers=HEADERS)
-    return response.json() if response.status_code == 200 else {"error": "PR data not found"}
-
-def get_repo_data(owner, repo):
-    repo_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}"
-    response = requests.get(repo_url, headers=HEADERS)
-    return response.json() if response.status_code == 200 else {"error": "Repo data not found"}
-
-def process_patch(patch):
-    lines = []
-    old_line_num = 0
-    new_line_num = 0
-
-    for line in patch.splitlines():
-        # Check if the line is a line number header like "@ -190,4 +190,4 @@"
-        header_match = re.match(r"^@@ -(\d+),\d+ \+(\d+),\d+ @@", line)
-        if header_match:
-            # Set initial line numbers from the header
-            old_line_num = int(header_match.group(1)) - 1
-            new_line_num = int(header_match.group(2)) - 1
-            continue  # Skip this line in the output
-
-        # Skip lines with "No newline at end of file"
-        if line.strip() == "\\ No newline at end of file":
-            continue  # Ignore this line
-
-        line_type = ""
-
-        if line.startswith('+'):
-            new_line_num += 1
-            line_type = "addition"
-            old_line_display = ""
-            new_line_display = new_line_num
-        elif line.startswith('-'):
-            old_line_num += 1
-            line_type = "deletion"
-            old_line_display = old_line_num
-            new_line_display = ""
-        else:
-            old_line_num += 1
-            new_line_num += 1
-            line_type = "context"
-            old_line_display = old_line_num
-            new_line_display = new_line_num
-
-        # Append the processed line data to the list
-        lines.append({
-            "content": line,
-            "type": line_type,
-            "old_line_num": old_line_display,
-            "new_line_num": new_line_display
-        })
-
-    return lines
+@app.errorhandler(GitHubError)
+def github_error(e):
+    # A missing PR is the caller's mistake; anything else means GitHub is unavailable to us
+    if e.status == 404:
+        return {"error": str(e)}, 404
+    if isinstance(e, RateLimitError):
+        return {"error": str(e)}, 503, {"Retry-After": "60"}
+    return {"error": str(e)}, 502
 
 # Home page
 @app.route('/')
@@ -95,73 +47,294 @@ def homepage():
 @app.route('/insights', methods=['POST'])
 def view_insights():
     pr_url = request.form.get("pr_url")
-    match = re.match(r"https://github\.com/([^/]+)/([^/]+)/pull/(\d+)", pr_url)
-    if not match:
+    pr = parse_pr_url(pr_url)
+    if pr is None:
         return {"error": "Invalid GitHub PR URL format"}, 400
 
-    owner, repo, pr_number = match.groups()
-    pr_data = get_pr_data(owner, repo, pr_number)
-    repo_data = get_repo_data(owner, repo)
-    pr_files = get_pr_files(owner, repo, pr_number)
-
-    # Original, Sequential Calls
-    # pr_suggestions = get_suggestions(pr_files)
-    # pr_summary = get_summary(pr_files)
-    # scores = get_scores(pr_files)
-
-    def run_calls():
-        with ThreadPoolExecutor() as executor:
-            future_suggestions = executor.submit(get_suggestions, pr_files)
-            future_summary = executor.submit(get_summary, pr_files)
-            future_scores = executor.submit(get_scores, pr_files)
-
-            # Get the results
-            pr_suggestions = future_suggestions.result()
-            pr_summary = future_summary.result()
-            scores = future_scores.result()
-
-        return pr_suggestions, pr_summary, scores
-
-    pr_suggestions, pr_summary, scores = run_calls()
-
-    for pr_file in pr_files:
-        score_file = next((sf for sf in scores["files"] if sf["filename"] == pr_file["filename"]), {})
-        pr_file["is_vulnerable"] = score_file.get("status") == "vulnerable"
-        pr_file["importance_score"] = score_file.get("importance_score", 0)
-        pr_file["vulnerability_summary"] = score_file.get("vulnerability_summary", None)
-
-    # Sort files by vulnerability and importance score
-    pr_files.sort(
-        key=lambda x: (
-            x.get("is_vulnerable", False),  # Prioritize vulnerable files
-            x.get("importance_score", 0)
-        ),
-        reverse=True
-    )
-
-    # Extract necessary details
-    org_name = repo_data.get("owner", {}).get("login", "Unknown Org")
-    org_logo = repo_data.get("owner", {}).get("avatar_url", "")
-    org_url = repo_data.get("owner", {}).get("html_url", "")
-    repo_name = repo_data.get("name", "Unknown Repo")
-    repo_url = repo_data.get("html_url", "")
-    pr_title = pr_data.get("title", "PR title unavailable")
-    pr_number = pr_data.get("number", "")
-    pr_link = pr_data.get("html_url", "")
+    owner, repo, pr_number = pr
+
+    if INSIGHTS_JOB_MODE:
+        # Hand the analysis to a background worker and free this one right away
+        try:
+            job = jobs.submit(run_insights_job, owner, repo, pr_number)
+        except jobs.JobQueueFull:
+            return {"error": "Too many analyses in progress, please retry shortly"}, 503
+        return redirect(url_for("view_job", job_id=job.id), code=303)
+
+    # Redirect to the PR's permalink so the page can be shared and reloaded
+    return redirect(url_for("view_pr_insights", owner=owner, repo=repo, pr_number=pr_number), code=303)
+
+@app.route('/insights/<owner>/<repo>/<int:pr_number>')
+def view_pr_insights(owner, repo, pr_number):
+    """
+    The insights page of a PR, at a URL that can be shared.
+
+    It is served from the analysis store while the PR's head commit is unchanged.
+    """
+    timer = request_timer()
+
+    # The analysis runs on the shared event loop; this thread only waits for it.
+    # An unchanged head is served from the store, and after a push only the
+    # changed files are analyzed again. A streamed summary is fetched by the
+    # page itself once it has loaded.
+    analysis = async_runtime.run(analyze_pr(owner, repo, pr_number, timer, summary=not SUMMARY_STREAMING))
 
     # Pass data to the template
+    with timer.stage("render"):
+        return render_analysis(analysis)
+
+def render_analysis(analysis):
+    # A stored summary is shown directly instead of being streamed again
+    pr_summary = render_summary(analysis.summary) if analysis.summary is not None else None
+    stream_url = None if pr_summary else summary_stream_url(analysis.owner, analysis.repo, analysis.pr_number)
     return render_template("insights.html",
-                           org_name=org_name,
-                           org_logo=org_logo,
-                           org_url=org_url,
-                           repo_name=repo_name,
-                           repo_url=repo_url,
-                           pr_title=pr_title,
-                           pr_number=pr_number,
-                           pr_link=pr_link,
-                           pr_files=pr_files,
+                           pr_files=analysis.files,
                            pr_summary=pr_summary,
-                           pr_suggestions=pr_suggestions)
+                           summary_stream_url=stream_url,
+                           suggestion_index=index_suggestions(analysis.suggestions),
+                           fragment_args=fragment_args(analysis),
+                           **pr_context(analysis.pr_data, analysis.repo_data))
+
+def fragment_args(analysis):
+    """URL arguments of the fragments that load the rest of a stored analysis's diffs."""
+    return {"owner": analysis.owner, "repo": analysis.repo, "pr_number": analysis.pr_number,
+            "head_sha": analysis.head_sha}
+
+def fragment_response(html):
+    # A fragment belongs to one head commit, so it never changes
+    return Response(html, mimetype="text/html", headers={"Cache-Control": "private, max-age=86400"})
+
+@app.route('/insights/<owner>/<repo>/<int:pr_number>/<head_sha>/diff')
+def diff_fragment(owner, repo, pr_number, head_sha):
+    """
+    Rows of one file's diff, from the `start`-th line, for files collapsed or cut short on the page.
+
+    They are rendered from the stored analysis, with its suggestions.
+    """
+    analysis = load_analysis(owner, repo, pr_number, head_sha)
+    file = analysis.file(request.args.get("file", "")) if analysis is not None else None
+    if file is None or "lines" not in file:
+        return {"error": "Diff not found"}, 404
+
+    lines, end = diff_window(file, request.args.get("start", 0, type=int))
+    suggestions = [suggestion for suggestion in analysis.suggestions if suggestion["filename"] == file["filename"]]
+    return fragment_response(render_template("partials/diff_rows.html", file=file, lines=lines, end=end,
+                                             suggestion_index=index_suggestions(suggestions),
+                                             fragment_args=fragment_args(analysis)))
+
+@app.route('/insights/<owner>/<repo>/<int:pr_number>/<head_sha>/files')
+def files_fragment(owner, repo, pr_number, head_sha):
+    """The page of the file list starting at the `offset`-th file of a stored analysis."""
+    analysis = load_analysis(owner, repo, pr_number, head_sha)
+    if analysis is None:
+        return {"error": "Analysis not found"}, 404
+
+    return fragment_response(render_template("partials/file_entries.html", pr_files=analysis.files,
+                                             files_offset=max(0, request.args.get("offset", 0, type=int)),
+                                             suggestion_index=index_suggestions(analysis.suggestions),
+                                             fragment_args=fragment_args(analysis)))
+
+def summary_stream_url(owner, repo, pr_number):
+    if not SUMMARY_STREAMING:
+        return None
+    return url_for("stream_pr_summary", owner=owner, repo=repo, pr_number=pr_number)
+
+@app.route('/insights/<owner>/<repo>/<int:pr_number>/summary')
+def stream_pr_summary(owner, repo, pr_number):
+    """
+    Streams the PR summary as Server-Sent Events.
+
+    Each `summary` event carries the HTML rendered so far; a final `done`
+    event closes the stream. The file list comes from the GitHub response
+    cache, so this costs a revalidation rather than a full fetch.
+    """
+    pr_files = get_pr_file_list(owner, repo, pr_number)
+
+    def events():
+        timer = RequestTimer()
+        try:
+            with timer.stage("summary"):
+                for html in async_runtime.iterate(stream_summary_html(pr_files)):
+                    yield f"event: summary\ndata: {json.dumps({'html': html})}\n\n"
+        except Exception as e:
+            print(f"Error streaming summary for {owner}/{repo}#{pr_number}: {e}")
+            yield f"event: failed\ndata: {json.dumps({'error': 'Summary unavailable'})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def render_partial(template, **context):
+    # Jobs render outside any request, but the partials still build URLs to their fragments
+    with app.test_request_context():
+        return render_template(template, **context)
+
+async def render_partial_async(template, **context):
+    # Rendering is CPU-bound, so it runs off the event loop
+    return await async_runtime.run_cpu(lambda: render_partial(template, **context))
+
+class JobProgress(AnalysisProgress):
+    def __init__(self, job):
+        """Publishes each part of a job's page as its analysis produces it."""
+        self.job = job
+        self.published = False
+
+    async def fetched(self, pr_data, repo_data):
+        self.job.publish("header", await render_partial_async("partials/pr_header.html",
+                                                              **pr_context(pr_data, repo_data)))
+
+    async def suggested(self, pr_files, suggestions):
+        self.job.publish("files", await render_partial_async("partials/files.html", pr_files=pr_files,
+                                                             suggestion_index=index_suggestions(suggestions),
+                                                             scores_pending=True))
+
+    async def analyzed(self, analysis):
+        await publish_files(self.job, analysis)
+        self.published = True
+
+    async def summarized(self, summary):
+        self.job.publish("summary", render_summary(summary))
+
+async def run_insights_job(job, owner, repo, pr_number):
+    """
+    Runs an analysis in the background, publishing each part of the page as it is ready.
+
+    Local suggestions are published first, then the files are re-rendered in
+    score order once scores arrive; the summary is published when it is done.
+    A job for a head that is stored, or already being analyzed by another job
+    or for the insights page, publishes that analysis once it has it.
+    """
+    progress = JobProgress(job)
+    # With streaming on, the job page streams the summary itself
+    analysis = await analyze_pr(owner, repo, pr_number, RequestTimer(), summary=not SUMMARY_STREAMING,
+                                progress=progress)
+    if not progress.published:
+        await publish_files(job, analysis)
+        if analysis.summary is not None:
+            job.publish("summary", render_summary(analysis.summary))
+
+async def publish_files(job, analysis):
+    job.publish("files", await render_partial_async("partials/files.html", pr_files=analysis.files,
+                                                    suggestion_index=index_suggestions(analysis.suggestions),
+                                                    fragment_args=fragment_args(analysis)))
+
+@app.route('/jobs/<job_id>')
+def view_job(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return {"error": "Job not found"}, 404
+    version = job.version
+    return render_template("job.html", job=job, version=version, sections=job.changes_since(0),
+                           summary_stream_url=summary_stream_url(job.owner, job.repo, job.pr_number))
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return {"error": "Job not found"}, 404
+    since = request.args.get("since", 0, type=int)
+    version = job.version
+    return {
+        "status": job.status,
+        "done": job.done,
+        "error": job.error,
+        "version": version,
+        "sections": job.changes_since(since),
+    }
+
+async def precompute_insights(job, owner, repo, pr_number, before):
+    # Nobody is waiting on the page yet, so the summary is generated up front too
+    await analyze_pr(owner, repo, pr_number, RequestTimer(), summary=True, before=before)
+
+@app.route('/webhooks/github', methods=['POST'])
+def github_webhook():
+    """
+    Receives GitHub `pull_request` webhooks and analyzes the PR ahead of time.
+
+    On `opened`, `reopened` and `synchronize` the analysis is queued as a
+    background job and stored, so the insights page is served from the store.
+    After a push, only the files changed since the previous head are analyzed again.
+    """
+    if not webhooks.GITHUB_WEBHOOK_SECRET:
+        return {"error": "Webhooks are not configured"}, 404
+    if not webhooks.verify_signature(webhooks.GITHUB_WEBHOOK_SECRET, request.get_data(),
+                                     request.headers.get("X-Hub-Signature-256")):
+        return {"error": "Invalid signature"}, 401
+
+    event = request.headers.get("X-GitHub-Event")
+    if event == "ping":
+        return {"status": "pong"}
+    target = webhooks.pull_request_target(event, request.get_json(silent=True) or {})
+    if target is None:
+        return {"status": "ignored"}
+
+    try:
+        job = jobs.submit(precompute_insights, *target)
+    except jobs.JobQueueFull:
+        return {"error": "Too many analyses in progress"}, 503
+    return {"status": "queued", "job_id": job.id}, 202
+
+@app.route('/api/insights', methods=['POST'])
+def api_insights():
+    """
+    Analyzes one PR and returns the results as JSON.
+
+    Expects a JSON body {"pr_url": ..., "summary": true}; set summary to false
+    to skip the model-written summary.
+    """
+    payload = request.get_json(silent=True) or {}
+    pr = parse_pr_url(payload.get("pr_url"))
+    if pr is None:
+        return {"error": "Invalid GitHub PR URL format"}, 400
+
+    owner, repo, pr_number = pr
+    result, repo_data = async_runtime.run(
+        analyze_pr_result(owner, repo, pr_number, request_timer(), summary=payload.get("summary", True) is not False))
+    result["repository"] = repository_result(f"{owner}/{repo}", repo_data)
+    return result
+
+@app.route('/api/insights/batch', methods=['POST'])
+def api_insights_batch():
+    """
+    Analyzes several PRs concurrently and streams the results as NDJSON.
+
+    Expects a JSON body {"pr_urls": [...], "concurrency": 4, "summary": true}.
+    One line is written per PR as soon as it finishes, in completion order.
+    Each repository's metadata is written once, on its own line before the
+    first PR from it, and PR lines refer to it by its owner/repo name.
+    """
+    payload = request.get_json(silent=True) or {}
+    pr_urls = payload.get("pr_urls")
+    if not isinstance(pr_urls, list) or not pr_urls:
+        return {"error": "pr_urls must be a non-empty list of GitHub PR URLs"}, 400
+    if len(pr_urls) > API_BATCH_MAX_PRS:
+        return {"error": f"At most {API_BATCH_MAX_PRS} PRs can be analyzed per request"}, 400
+
+    prs = {}
+    for pr_url in pr_urls:
+        pr = parse_pr_url(pr_url) if isinstance(pr_url, str) else None
+        if pr is None:
+            return {"error": f"Invalid GitHub PR URL format: {pr_url}"}, 400
+        # The same PR listed twice is analyzed once
+        prs.setdefault(pr, pr_url)
+
+    try:
+        concurrency = max(1, min(int(payload.get("concurrency", API_BATCH_CONCURRENCY)), API_BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return {"error": "concurrency must be an integer"}, 400
+    summary = payload.get("summary", True) is not False
+
+    def lines():
+        batch = analyze_batch([(pr_url, *pr) for pr, pr_url in prs.items()], concurrency, summary)
+        for record in async_runtime.iterate(batch):
+            yield json.dumps(record) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     app.run(debug=False)
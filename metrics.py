@@ -0,0 +1,99 @@
+import ast
+
+import lizard
+from radon.metrics import h_visit_ast, mi_compute
+from radon.raw import analyze
+from radon.visitors import ComplexityVisitor
+
+
+class FunctionMetrics:
+    __slots__ = ("name", "start_line", "end_line", "complexity", "length")
+
+    def __init__(self, name, start_line, end_line, complexity, length):
+        """
+        Metrics for one function, method or (in Python) class.
+
+        Parameters:
+            name (str): The function name.
+            start_line (int): First line of the function in the analyzed content.
+            end_line (int): Last line of the function in the analyzed content.
+            complexity (int): Cyclomatic complexity.
+            length (int): Length of the function in lines.
+        """
+        self.name = name
+        self.start_line = start_line
+        self.end_line = end_line
+        self.complexity = complexity
+        self.length = length
+
+
+class FileMetrics:
+    __slots__ = ("filename", "language", "functions", "maintainability_index")
+
+    def __init__(self, filename, language, functions, maintainability_index=None):
+        """
+        Every metric computed for one file's content, from a single parse.
+
+        Parameters:
+            filename (str): The file the content came from.
+            language (str): "python" when radon was used, otherwise "lizard".
+            functions (list): FunctionMetrics for each function found.
+            maintainability_index (float): Radon's MI for Python content, else None.
+        """
+        self.filename = filename
+        self.language = language
+        self.functions = functions
+        self.maintainability_index = maintainability_index
+
+
+def compute_python_metrics(content, filename):
+    try:
+        tree = ast.parse(content)
+    except (IndentationError, SyntaxError) as e:
+        # Log or handle the error gracefully
+        print(f"Error analyzing {filename}: {e}")
+        return FileMetrics(filename, "python", [])
+
+    # One AST feeds both the per-block complexity and the MI computation
+    visitor = ComplexityVisitor.from_ast(tree)
+    functions = [
+        FunctionMetrics(block.name, block.lineno, block.endline, block.complexity,
+                        block.endline - block.lineno + 1)
+        for block in visitor.blocks
+    ]
+
+    maintainability_index = None
+    try:
+        raw = analyze(content)
+        comment_lines = raw.comments + raw.multi
+        comments = comment_lines / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+        maintainability_index = mi_compute(h_visit_ast(tree).total.volume,
+                                           visitor.total_complexity, raw.lloc, comments)
+    except (IndentationError, SyntaxError, TypeError) as e:
+        print(f"Error analyzing maintainability in {filename}: {e}")
+
+    return FileMetrics(filename, "python", functions, maintainability_index)
+
+
+def compute_lizard_metrics(content, filename):
+    lizard_analysis = lizard.analyze_file.analyze_source_code(filename, content)
+    functions = [
+        FunctionMetrics(func.name, func.start_line, func.end_line,
+                        func.cyclomatic_complexity, func.length)
+        for func in lizard_analysis.function_list
+    ]
+    return FileMetrics(filename, "lizard", functions)
+
+
+def compute_metrics(content, filename):
+    """
+    Parses a file's content once and returns all of its metrics.
+
+    Python is analyzed with radon; every other language with lizard.
+
+    Returns:
+        FileMetrics: The metrics for the file.
+    """
+    if filename.endswith('.py'):
+        return compute_python_metrics(content, filename)
+    return compute_lizard_metrics(content, filename)
@@ -0,0 +1,137 @@
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Content rules only look at this many characters of a line, so a single huge
+# minified or generated line costs a bounded amount of work
+READABILITY_MAX_SCAN_LENGTH = int(os.getenv("READABILITY_MAX_SCAN_LENGTH", "1000"))
+
+MAX_LINE_LENGTH = 80
+MAX_NESTING_DEPTH = 5
+
+# Every pattern below is a plain scan without backreferences or nested
+# quantifiers, so matching is linear in the length of the line
+_PATTERN_BRACKET = re.compile(r'[(){}]')
+_PATTERN_INCONSISTENT_INDENTATION = re.compile(r'^[ ]{1,3}[^ ]|^[ ]{5,}')  # Non-4-space indentation
+_PATTERN_DECLARATION = re.compile(r'\b(?:int|char|float|double|unsigned|bool)\s+\b')
+_PATTERN_GENERIC_NAME = re.compile(r'\b(data|temp|value|buf|var|res|item)\b')
+
+
+class Line:
+    __slots__ = ("text", "scan_text", "_nesting_depth")
+
+    def __init__(self, text):
+        """
+        An added line as seen by the readability rules.
+
+        Features shared by several rules are computed at most once per line.
+
+        Parameters:
+            text (str): The added line without its '+' marker and surrounding whitespace.
+        """
+        self.text = text
+        self.scan_text = text[:READABILITY_MAX_SCAN_LENGTH]
+        self._nesting_depth = None
+
+    @property
+    def nesting_depth(self):
+        """Deepest nesting of ( and { on the line, counted in a single pass."""
+        if self._nesting_depth is None:
+            depth = 0
+            max_depth = 0
+            for match in _PATTERN_BRACKET.finditer(self.scan_text):
+                if match.group() in "({":
+                    depth += 1
+                    if depth > max_depth:
+                        max_depth = depth
+                elif depth > 0:
+                    depth -= 1
+            self._nesting_depth = max_depth
+        return self._nesting_depth
+
+
+class ReadabilityRule:
+    """
+    Base class for a readability check on a single added line.
+
+    Subclasses set suggestion_type and implement check(), which yields one
+    message per issue found on the line.
+    """
+
+    suggestion_type = "Readability Suggestion"
+
+    def check(self, line):
+        raise NotImplementedError
+
+
+class LongLineRule(ReadabilityRule):
+    suggestion_type = "Line Break Suggestion"
+
+    def check(self, line):
+        if len(line.text) > MAX_LINE_LENGTH:
+            yield f"Line exceeds {MAX_LINE_LENGTH} characters. Consider breaking it into multiple lines for readability."
+
+
+class IndentationRule(ReadabilityRule):
+    # Assuming 4 spaces per indentation level
+    suggestion_type = "Indentation Suggestion"
+
+    def check(self, line):
+        if _PATTERN_INCONSISTENT_INDENTATION.match(line.text):
+            yield "Line has inconsistent indentation. Consider using 4 spaces for indentation."
+
+
+class NestingRule(ReadabilityRule):
+    suggestion_type = "Nesting Suggestion"
+
+    def check(self, line):
+        if line.nesting_depth >= MAX_NESTING_DEPTH:
+            yield f"Code appears deeply nested ({MAX_NESTING_DEPTH}+ levels). Consider refactoring to reduce nesting depth."
+
+
+class GenericNameRule(ReadabilityRule):
+    # Less sensitive: only flags names on lines that look like a C-style declaration
+    suggestion_type = "Variable Naming Suggestion"
+
+    def check(self, line):
+        if not _PATTERN_DECLARATION.search(line.scan_text):
+            return
+        for match in _PATTERN_GENERIC_NAME.finditer(line.scan_text):
+            yield f"Variable '{match.group()}' is too generic. Consider renaming it to something more descriptive."
+
+
+# Rules run, in order, on every added line
+READABILITY_RULES = [LongLineRule(), IndentationRule(), NestingRule(), GenericNameRule()]
+
+
+def register_rule(rule):
+    """Adds a ReadabilityRule instance to the rules run on every added line."""
+    READABILITY_RULES.append(rule)
+
+
+def run_rules(added_lines, rules=None):
+    """
+    Runs every rule over a file's added lines in a single pass.
+
+    Parameters:
+        added_lines: Iterable of (line_number, text) pairs, e.g. ParsedDiff.additions().
+        rules (list): Rules to run; defaults to READABILITY_RULES.
+
+    Returns:
+        list: (line_number, message, suggestion_type) tuples in line order.
+    """
+    rules = READABILITY_RULES if rules is None else rules
+    results = []
+    for line_number, text in added_lines:
+        text = text.strip()
+        # Skip `#define` lines, which don't require readability suggestions
+        if not text or text.startswith("#define"):
+            continue
+        line = Line(text)
+        for rule in rules:
+            for message in rule.check(line):
+                results.append((line_number, message, rule.suggestion_type))
+    return results
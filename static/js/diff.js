@@ -0,0 +1,46 @@
+// Loads collapsed diffs, further windows of long diffs and further pages of files on demand.
+// Listeners sit on the document so they also cover HTML injected by the job page.
+(function () {
+    function load(url, done, failed) {
+        fetch(url)
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text();
+            })
+            .then(done)
+            .catch(failed);
+    }
+
+    // A collapsed file is fetched the first time it is opened; toggle does not bubble, so listen while capturing
+    document.addEventListener("toggle", function (event) {
+        var details = event.target;
+        if (!details.open || !details.classList || !details.classList.contains("file-lines")) {
+            return;
+        }
+        var body = details.querySelector("tbody[data-url]");
+        if (!body) {
+            return;
+        }
+        var url = body.getAttribute("data-url");
+        body.removeAttribute("data-url");
+        load(url, function (html) { body.innerHTML = html; }, function () {
+            body.innerHTML = '<tr class="diff-more"><td colspan="3" class="job-error">Could not load the diff.</td></tr>';
+        });
+    }, true);
+
+    // "Show more" buttons are replaced by what they load, which may end in another button
+    document.addEventListener("click", function (event) {
+        var button = event.target.closest && event.target.closest("button.load-more");
+        if (!button) {
+            return;
+        }
+        button.disabled = true;
+        var holder = button.closest(".diff-more, .files-more");
+        load(button.getAttribute("data-url"), function (html) { holder.outerHTML = html; }, function () {
+            button.disabled = false;
+            button.textContent = "Could not load, try again";
+        });
+    });
+})();
@@ -0,0 +1,358 @@
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from dotenv import load_dotenv
+
+from diff import parse_file
+
+load_dotenv()
+
+# "sqlite" keeps analyses across restarts and shares them between workers;
+# "memory" keeps them per process
+ANALYSIS_STORE_BACKEND = os.getenv("ANALYSIS_STORE_BACKEND", "sqlite")
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", "analyses.sqlite3")
+# Analyses kept by the memory backend, across all PRs and head commits
+ANALYSIS_STORE_MAX_ENTRIES = int(os.getenv("ANALYSIS_STORE_MAX_ENTRIES", "200"))
+# Stored size the sqlite backend is trimmed back to, least recently viewed first
+ANALYSIS_STORE_MAX_BYTES = int(os.getenv("ANALYSIS_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Records larger than this (in practice, those with large patches) are compressed
+ANALYSIS_STORE_COMPRESS_MIN_BYTES = int(os.getenv("ANALYSIS_STORE_COMPRESS_MIN_BYTES", "4096"))
+
+# Seconds between updates of a row's last-viewed time, which orders trimming;
+# views in between do not write to the database
+ANALYSIS_STORE_TOUCH_INTERVAL = float(os.getenv("ANALYSIS_STORE_TOUCH_INTERVAL", "300"))
+
+# Longest one worker may hold the claim on analyzing a head before others take over
+ANALYSIS_LEASE_TTL = float(os.getenv("ANALYSIS_LEASE_TTL", "300"))
+
+# Version of the serialized record; records in another format are ignored
+FORMAT_VERSION = 1
+
+
+def analysis_key(owner, repo, pr_number, head_sha):
+    """
+    The key an analysis is stored, coalesced and leased under.
+
+    PR numbers arrive as strings from URLs and as ints from GitHub payloads;
+    both give the same key.
+    """
+    return (owner, repo, int(pr_number), head_sha)
+
+
+class Analysis:
+    __slots__ = ("owner", "repo", "pr_number", "head_sha", "pr_data", "repo_data",
+                 "files", "suggestions", "scores", "summary", "created")
+
+    def __init__(self, owner, repo, pr_number, head_sha, pr_data, repo_data, files, suggestions, scores,
+                 summary=None, created=None):
+        """
+        The complete analysis of one PR at one head commit.
+
+        Parameters:
+            pr_data (dict): The PR as returned by GitHub.
+            repo_data (dict): The repository as returned by GitHub.
+            files (list): The PR's files with parsed patches and scores applied, in review order.
+            suggestions (list): Suggestion dicts for all files.
+            scores (dict): {filename: score dict} as returned by the model.
+            summary (str): The summary in markdown, or None if it was not generated.
+        """
+        self.owner = owner
+        self.repo = repo
+        self.pr_number = int(pr_number)
+        self.head_sha = head_sha
+        self.pr_data = pr_data
+        self.repo_data = repo_data
+        self.files = files
+        self.suggestions = suggestions
+        self.scores = scores
+        self.summary = summary
+        self.created = created if created is not None else time.time()
+
+    @property
+    def key(self):
+        return analysis_key(self.owner, self.repo, self.pr_number, self.head_sha)
+
+    def file(self, filename):
+        for file in self.files:
+            if file["filename"] == filename:
+                return file
+        return None
+
+
+class MemoryStore:
+    """
+    Analyses keyed by (owner, repo, pr_number, head_sha), least recently used evicted first.
+
+    The latest head analyzed for each PR is tracked as well, so a push can be
+    re-analyzed incrementally from it.
+    """
+
+    def __init__(self, max_entries=ANALYSIS_STORE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def get(self, owner, repo, pr_number, head_sha):
+        key = analysis_key(owner, repo, pr_number, head_sha)
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is not None:
+                self._entries.move_to_end(key)
+            return analysis
+
+    def latest(self, owner, repo, pr_number):
+        """The most recently stored analysis of the PR, at whatever head it was."""
+        with self._lock:
+            key = self._latest.get((owner, repo, int(pr_number)))
+            return self._entries.get(key) if key is not None else None
+
+    def put(self, analysis):
+        with self._lock:
+            self._entries[analysis.key] = analysis
+            self._entries.move_to_end(analysis.key)
+            self._latest[analysis.key[:3]] = analysis.key
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                if self._latest.get(evicted[:3]) == evicted:
+                    del self._latest[evicted[:3]]
+
+    def claim(self, key, ttl=ANALYSIS_LEASE_TTL):
+        # Nothing is shared with other processes, so there is no one to coordinate with
+        return True
+
+    def release(self, key):
+        pass
+
+
+def serialize(analysis):
+    """
+    Encodes an analysis as compact JSON, keeping only what is shown or reused.
+
+    Files are stored as rows with their patch rather than their parsed diff,
+    which is rebuilt on load. Suggestions are grouped by file as
+    [line_number, text, type] triples.
+
+    Returns:
+        bytes: The UTF-8 JSON record.
+    """
+    owner = analysis.repo_data.get("owner", {})
+    suggestions = {}
+    for suggestion in analysis.suggestions:
+        suggestions.setdefault(suggestion["filename"], []).append(
+            [suggestion["line_number"], suggestion["suggestion_text"], suggestion["suggestion_type"]])
+    record = {
+        "v": FORMAT_VERSION,
+        "pr": {field: analysis.pr_data.get(field) for field in ("number", "title", "html_url")},
+        "repo": {
+            "name": analysis.repo_data.get("name"),
+            "html_url": analysis.repo_data.get("html_url"),
+            "owner": {field: owner.get(field) for field in ("login", "avatar_url", "html_url")},
+        },
+        "files": [[file["filename"], file.get("status"), file.get("additions"), file.get("deletions"),
+                   file.get("changes"), file.get("sha"), file.get("patch")] for file in analysis.files],
+        "scores": analysis.scores,
+        "suggestions": suggestions,
+        "summary": analysis.summary,
+        "created": analysis.created,
+    }
+    return json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize(owner, repo, pr_number, head_sha, data):
+    """
+    Rebuilds an analysis from serialize(), parsing its patches again.
+
+    Returns:
+        Analysis or None: None if the record is in an older format.
+    """
+    record = json.loads(data)
+    if record.get("v") != FORMAT_VERSION:
+        return None
+
+    pr_data = dict(record["pr"], head={"sha": head_sha})
+    scores = record["scores"]
+    files = []
+    for filename, status, additions, deletions, changes, sha, patch in record["files"]:
+        file = {"filename": filename, "status": status, "additions": additions, "deletions": deletions,
+                "changes": changes, "sha": sha}
+        if patch is not None:
+            file["patch"] = patch
+            file["lines"] = parse_file(file)
+        score_file = scores.get(filename, {})
+        file["is_vulnerable"] = score_file.get("status") == "vulnerable"
+        file["importance_score"] = score_file.get("importance_score", 0)
+        file["vulnerability_summary"] = score_file.get("vulnerability_summary", None)
+        file["triage"] = score_file.get("triage")
+        files.append(file)
+
+    suggestions = [
+        {"filename": filename, "line_number": line_number, "suggestion_text": text, "suggestion_type": kind}
+        for filename, file_suggestions in record["suggestions"].items()
+        for line_number, text, kind in file_suggestions
+    ]
+    return Analysis(owner, repo, pr_number, head_sha, pr_data, record["repo"], files, suggestions, scores,
+                    record["summary"], record["created"])
+
+
+class SQLiteStore:
+    """
+    Analyses in a SQLite file, kept across restarts and shared by every worker that opens it.
+
+    Each row is one serialized analysis, zlib-compressed when it is larger
+    than compress_min_bytes. Once the stored total passes max_bytes, the
+    least recently viewed rows are deleted until it is back under 90% of it.
+    A row's last-viewed time is written at most once per touch_interval.
+
+    A second table holds leases, so that only one worker analyzes a given
+    head at a time while the others wait for its result.
+    """
+
+    def __init__(self, path, max_bytes=ANALYSIS_STORE_MAX_BYTES,
+                 compress_min_bytes=ANALYSIS_STORE_COMPRESS_MIN_BYTES, touch_interval=ANALYSIS_STORE_TOUCH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress_min_bytes = compress_min_bytes
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self):
+        # The file is opened on first use, so creating the store (e.g. on import) touches nothing
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._create_schema(conn)
+        return conn
+
+    def _create_schema(self, conn):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS analyses ("
+                    "owner TEXT NOT NULL, repo TEXT NOT NULL, pr_number INTEGER NOT NULL, head_sha TEXT NOT NULL, "
+                    "data BLOB NOT NULL, compressed INTEGER NOT NULL, size INTEGER NOT NULL, "
+                    "created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                    "PRIMARY KEY (owner, repo, pr_number, head_sha))"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS analyses_latest ON analyses (owner, repo, pr_number, created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed_at)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS analysis_leases ("
+                    "owner TEXT NOT NULL, repo TEXT NOT NULL, pr_number INTEGER NOT NULL, head_sha TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, PRIMARY KEY (owner, repo, pr_number, head_sha))"
+                )
+            self._schema_ready = True
+
+    def _load(self, row):
+        owner, repo, pr_number, head_sha, data, compressed, accessed_at = row
+        if compressed:
+            data = zlib.decompress(data)
+        now = time.time()
+        if now - accessed_at >= self.touch_interval:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE analyses SET accessed_at = ? "
+                    "WHERE owner = ? AND repo = ? AND pr_number = ? AND head_sha = ?",
+                    (now, owner, repo, pr_number, head_sha)
+                )
+        return deserialize(owner, repo, pr_number, head_sha, data)
+
+    def get(self, owner, repo, pr_number, head_sha):
+        row = self._connect().execute(
+            "SELECT owner, repo, pr_number, head_sha, data, compressed, accessed_at FROM analyses "
+            "WHERE owner = ? AND repo = ? AND pr_number = ? AND head_sha = ?",
+            (owner, repo, int(pr_number), head_sha)
+        ).fetchone()
+        return self._load(row) if row is not None else None
+
+    def latest(self, owner, repo, pr_number):
+        """The most recently stored analysis of the PR, at whatever head it was."""
+        row = self._connect().execute(
+            "SELECT owner, repo, pr_number, head_sha, data, compressed, accessed_at FROM analyses "
+            "WHERE owner = ? AND repo = ? AND pr_number = ? ORDER BY created_at DESC LIMIT 1",
+            (owner, repo, int(pr_number))
+        ).fetchone()
+        return self._load(row) if row is not None else None
+
+    def put(self, analysis):
+        data = serialize(analysis)
+        compressed = len(data) > self.compress_min_bytes
+        if compressed:
+            data = zlib.compress(data, 6)
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses "
+                "(owner, repo, pr_number, head_sha, data, compressed, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*analysis.key, data, int(compressed), len(data), analysis.created, now)
+            )
+            self._trim(conn, analysis.key)
+
+    def claim(self, key, ttl=ANALYSIS_LEASE_TTL):
+        """
+        Claims the analysis of a head for this worker, unless another worker holds it.
+
+        A lease left behind by a worker that died runs out after `ttl` seconds.
+
+        Returns:
+            bool: Whether the claim was granted.
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM analysis_leases WHERE expires_at < ?", (now,))
+            granted = conn.execute(
+                "INSERT OR IGNORE INTO analysis_leases (owner, repo, pr_number, head_sha, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, now + ttl)
+            ).rowcount == 1
+        return granted
+
+    def release(self, key):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM analysis_leases WHERE owner = ? AND repo = ? AND pr_number = ? AND head_sha = ?", key
+            )
+
+    def _trim(self, conn, keep):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim with some headroom so a busy store is not trimmed on every write
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        evicted = []
+        # The analysis just written is kept even if it alone is over the limit
+        for key, size in conn.execute(
+            "SELECT rowid, size FROM analyses "
+            "WHERE NOT (owner = ? AND repo = ? AND pr_number = ? AND head_sha = ?) ORDER BY accessed_at",
+            keep
+        ):
+            if freed >= excess:
+                break
+            evicted.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM analyses WHERE rowid = ?", evicted)
+
+
+def create_store(backend=ANALYSIS_STORE_BACKEND, path=ANALYSIS_STORE_PATH,
+                 max_entries=ANALYSIS_STORE_MAX_ENTRIES, max_bytes=ANALYSIS_STORE_MAX_BYTES):
+    if backend == "sqlite":
+        return SQLiteStore(path, max_bytes)
+    if backend == "memory":
+        return MemoryStore(max_entries)
+    raise ValueError(f"Unknown analysis store backend: {backend}")
@@ -0,0 +1,49 @@
+import os
+import sys
+
+# The app reads its settings at import time, so they are set before any test imports it
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["ANALYSIS_STORE_BACKEND"] = "memory"
+os.environ["LLM_CACHE_BACKEND"] = "memory"
+os.environ.pop("GITHUB_CACHE_DIR", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import pytest  # noqa: E402
+
+from benchmarks.fakes import FakeGitHubServer, FakeOpenAI  # noqa: E402
+
+
+@pytest.fixture
+def services(monkeypatch):
+    """
+    Points the app at a fake GitHub server and a fake OpenAI client, with empty caches and store.
+
+    Returns a function that starts them for a PR's files and returns (server, openai).
+    """
+    import ai
+    import analysis
+    import github_client
+    from github_cache import ResponseCache
+    from llm_cache import create_cache
+    from store import MemoryStore, create_store
+
+    servers = []
+
+    def start(pr_files, head_sha="0" * 40, openai_latency=0.0):
+        server = FakeGitHubServer(pr_files, head_sha=head_sha).start()
+        servers.append(server)
+        openai = FakeOpenAI(latency=openai_latency)
+        store = create_store("memory")
+        monkeypatch.setattr(github_client, "GITHUB_API_URL", server.url)
+        monkeypatch.setattr(github_client, "response_cache", ResponseCache(github_client.GITHUB_CACHE_MAX_BYTES))
+        monkeypatch.setattr(ai, "client", openai)
+        monkeypatch.setattr(ai, "llm_cache", create_cache("memory"))
+        monkeypatch.setattr(analysis, "analysis_store", store)
+        monkeypatch.setattr(analysis, "recent_analyses", MemoryStore(analysis.ANALYSIS_RECENT_ENTRIES))
+        return server, openai
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+import analysis_pool
+
+
+def nap(name, seconds):
+    time.sleep(seconds)
+    return name
+
+
+def fail(name):
+    raise ValueError(name)
+
+
+def use_pool(monkeypatch, processes):
+    monkeypatch.setattr(analysis_pool, "ANALYSIS_PROCESSES", processes)
+    monkeypatch.setattr(analysis_pool, "ANALYSIS_INLINE_MAX_FILES", 0)
+    monkeypatch.setattr(analysis_pool, "ANALYSIS_FILE_TIMEOUT", 1.0)
+    monkeypatch.setattr(analysis_pool, "_pool", None)
+    killed = []
+    kill = analysis_pool.Worker.kill
+
+    def record_kill(worker):
+        killed.append(worker.process)
+        kill(worker)
+
+    monkeypatch.setattr(analysis_pool.Worker, "kill", record_kill)
+    return killed
+
+
+def test_hung_analysis_is_skipped_and_its_worker_killed(monkeypatch):
+    killed = use_pool(monkeypatch, 2)
+
+    results = analysis_pool.map_files(nap, [("a.py", 0), ("hang.py", 60), ("b.py", 0)], default="skipped")
+
+    assert results == ["a.py", "skipped", "b.py"]
+    assert len(killed) == 1
+    assert not killed[0].is_alive()
+    # The killed worker is replaced on the next call
+    assert analysis_pool.map_files(nap, [("c.py", 0), ("d.py", 0)], default="skipped") == ["c.py", "d.py"]
+
+
+def test_hung_request_does_not_affect_a_concurrent_one(monkeypatch):
+    killed = use_pool(monkeypatch, 3)
+    hung = [("a0.py", 0), ("hang.py", 60), ("a2.py", 0)]
+    # Together the healthy files take longer than the timeout, but each one is quick
+    healthy = [(f"b{index}.py", 0.3) for index in range(6)]
+
+    with ThreadPoolExecutor(2) as executor:
+        hung_results = executor.submit(analysis_pool.map_files, nap, hung, "skipped")
+        time.sleep(0.1)
+        healthy_results = executor.submit(analysis_pool.map_files, nap, healthy, "skipped")
+        assert healthy_results.result() == [name for name, _ in healthy]
+        assert hung_results.result() == ["a0.py", "skipped", "a2.py"]
+
+    # Only the worker running the hung file was killed
+    assert len(killed) == 1
+
+
+def test_errors_are_raised_after_every_file_finishes(monkeypatch):
+    use_pool(monkeypatch, 2)
+    with pytest.raises(ValueError):
+        analysis_pool.map_files(fail, [("a.py",), ("b.py",)])
+    # The workers survive a failing task
+    assert analysis_pool.map_files(nap, [("c.py", 0), ("d.py", 0)]) == ["c.py", "d.py"]
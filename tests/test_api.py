@@ -0,0 +1,116 @@
+import json
+
+import analysis
+import main
+from benchmarks.synthetic import many_files
+from github_client import GitHubError
+
+HEAD = "a" * 40
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_api_insights_returns_the_analysis(services):
+    server, openai = services(many_files(5, 10), head_sha=HEAD)
+    client = main.app.test_client()
+
+    response = client.post("/api/insights", json={"pr_url": "https://github.com/o/r/pull/1"})
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["pr"] == {"number": 1, "title": "Synthetic PR with 5 files",
+                            "html_url": "https://github.com/o/r/pull/1", "head_sha": HEAD}
+    assert result["repository"]["full_name"] == "o/r"
+    assert result["repository"]["owner"]["login"] == "o"
+    assert result["summary"].startswith("### Summary")
+    assert len(result["files"]) == 5
+    assert all("suggestions" in file and "importance_score" in file for file in result["files"])
+    assert set(result["triage"]) == {"files", "tokens_saved"}
+
+
+def test_api_insights_can_skip_the_summary(services):
+    server, openai = services(many_files(5, 10))
+    client = main.app.test_client()
+
+    response = client.post("/api/insights", json={"pr_url": "https://github.com/o/r/pull/1", "summary": False})
+
+    assert response.status_code == 200
+    assert response.get_json()["summary"] is None
+
+
+def test_api_insights_rejects_bad_urls(services):
+    services(many_files(5, 10))
+    client = main.app.test_client()
+
+    for body in ({"pr_url": "https://example.com/o/r/pull/1"}, {}, None):
+        response = client.post("/api/insights", json=body)
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "Invalid GitHub PR URL format"}
+
+
+def test_batch_rejects_bad_requests(services, monkeypatch):
+    services(many_files(5, 10))
+    monkeypatch.setattr(main, "API_BATCH_MAX_PRS", 2)
+    client = main.app.test_client()
+    urls = [f"https://github.com/o/r/pull/{number}" for number in (1, 2, 3)]
+
+    for body in ({"pr_urls": []}, {"pr_urls": "https://github.com/o/r/pull/1"}, {"pr_urls": urls},
+                 {"pr_urls": ["https://github.com/o/r/pull/1", "not a url"]},
+                 {"pr_urls": [urls[0]], "concurrency": "many"}):
+        response = client.post("/api/insights/batch", json=body)
+        assert response.status_code == 400, body
+        assert "error" in response.get_json()
+
+
+def test_batch_streams_repositories_before_their_prs(services):
+    server, openai = services(many_files(5, 10))
+    client = main.app.test_client()
+    urls = ["https://github.com/o/r/pull/1", "https://github.com/o/r/pull/2", "https://github.com/o/other/pull/3"]
+
+    response = client.post("/api/insights/batch", json={"pr_urls": urls, "summary": False})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    records = read_lines(response)
+    assert sorted(record["pr_url"] for record in records if record["type"] == "pr") == sorted(urls)
+    # Each repository is described once, before the first PR that refers to it
+    repositories = [record["full_name"] for record in records if record["type"] == "repository"]
+    assert sorted(repositories) == ["o/other", "o/r"]
+    for name in repositories:
+        first_pr = next(index for index, record in enumerate(records)
+                        if record["type"] == "pr" and record["repository"] == name)
+        assert records.index(next(record for record in records if record.get("full_name") == name)) < first_pr
+
+
+def test_batch_reports_a_failed_pr_and_finishes_the_rest(services, monkeypatch):
+    server, openai = services(many_files(5, 10))
+    get_pr_data_async = analysis.get_pr_data_async
+
+    async def missing_pr_2(owner, repo, pr_number):
+        if int(pr_number) == 2:
+            raise GitHubError("Failed to fetch PR data: 404", status=404)
+        return await get_pr_data_async(owner, repo, pr_number)
+
+    monkeypatch.setattr(analysis, "get_pr_data_async", missing_pr_2)
+    client = main.app.test_client()
+    urls = ["https://github.com/o/r/pull/1", "https://github.com/o/r/pull/2"]
+
+    records = read_lines(client.post("/api/insights/batch", json={"pr_urls": urls, "summary": False}))
+
+    prs = {record["pr_url"]: record for record in records if record["type"] == "pr"}
+    assert prs[urls[1]] == {"type": "pr", "pr_url": urls[1], "error": "Failed to fetch PR data: 404"}
+    assert prs[urls[0]]["pr"]["number"] == 1
+    assert "error" not in prs[urls[0]]
+
+
+def test_batch_analyzes_a_repeated_pr_once(services):
+    server, openai = services(many_files(5, 10))
+    client = main.app.test_client()
+    url = "https://github.com/o/r/pull/1"
+
+    records = read_lines(client.post("/api/insights/batch", json={"pr_urls": [url, url, url + "/"],
+                                                                   "summary": False}))
+
+    assert [record["type"] for record in records] == ["repository", "pr"]
@@ -0,0 +1,57 @@
+import threading
+
+import ai
+import analysis
+import async_runtime
+import github_client
+import main
+from benchmarks.synthetic import many_files
+
+
+class ThreadRecorder:
+    """Wraps a cache and records which threads its methods are called on."""
+
+    def __init__(self, cache, names):
+        self.cache = cache
+        self.threads = set()
+        for name in names:
+            setattr(self, name, self._wrap(getattr(cache, name)))
+
+    def _wrap(self, method):
+        def call(*args, **kwargs):
+            self.threads.add(threading.current_thread().name)
+            return method(*args, **kwargs)
+        return call
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+
+def test_caches_are_used_off_the_event_loop(services, monkeypatch):
+    services(many_files(6, 10))
+    llm_cache = ThreadRecorder(ai.llm_cache, ("get", "set"))
+    response_cache = ThreadRecorder(github_client.response_cache, ("get", "store"))
+    analysis_store = ThreadRecorder(analysis.analysis_store, ("get", "latest", "put", "claim", "release"))
+    monkeypatch.setattr(ai, "llm_cache", llm_cache)
+    monkeypatch.setattr(github_client, "response_cache", response_cache)
+    monkeypatch.setattr(analysis, "analysis_store", analysis_store)
+    monkeypatch.setattr(main, "SUMMARY_STREAMING", False)
+
+    assert main.app.test_client().get("/insights/o/r/1").status_code == 200
+
+    assert llm_cache.threads and response_cache.threads and analysis_store.threads
+    # async_runtime names the loop's thread "event-loop" and the I/O executor's "io_*"
+    threads = llm_cache.threads | response_cache.threads | analysis_store.threads
+    assert all(name.startswith("io_") for name in threads), threads
+
+
+def test_io_is_not_queued_behind_cpu_work():
+    release = threading.Event()
+    # Every CPU thread is busy, e.g. with large analyses
+    busy = [async_runtime.cpu_executor.submit(release.wait, 30) for _ in range(async_runtime.CPU_WORKERS)]
+    try:
+        assert async_runtime.run(async_runtime.run_io(lambda: "read"), timeout=5) == "read"
+    finally:
+        release.set()
+        for future in busy:
+            future.result()
@@ -0,0 +1,36 @@
+import threading
+import time
+
+import jobs
+import main
+from benchmarks.synthetic import many_files
+
+
+def wait_for(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.done:
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.02)
+    assert job.error is None, job.error
+
+
+def test_job_and_page_share_one_analysis(services):
+    pr_files = many_files(20, 20)
+
+    # One analysis on its own, for the number of LLM calls it takes
+    _, openai = services([dict(file) for file in pr_files], openai_latency=0.3)
+    wait_for(jobs.submit(main.run_insights_job, "o", "r", "1"))
+    single = openai.calls
+    assert single > 0
+
+    # A job (PR number from the URL, a string) and the page (an int) for the same head at once
+    _, openai = services([dict(file) for file in pr_files], openai_latency=0.3)
+    job = jobs.submit(main.run_insights_job, "o", "r", "1")
+    statuses = []
+    page = threading.Thread(target=lambda: statuses.append(main.app.test_client().get("/insights/o/r/1").status_code))
+    page.start()
+    wait_for(job)
+    page.join(30)
+
+    assert statuses == [200]
+    assert openai.calls == single
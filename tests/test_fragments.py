@@ -0,0 +1,84 @@
+import html
+import re
+
+import diff_view
+import main
+from analysis import load_analysis
+from benchmarks.synthetic import many_files
+
+HEAD = "a" * 40
+
+
+def more_url(page, label):
+    """The URL behind the page's `label` button, or None if there is none."""
+    button = re.search(r'data-url="([^"]+)">\s*' + re.escape(label), page)
+    return html.unescape(button.group(1)) if button else None
+
+
+def row_count(page):
+    return page.count('<tr class="diff-line ')
+
+
+def view_page(services, monkeypatch, num_files=3, lines_per_file=50):
+    server, openai = services(many_files(num_files, lines_per_file), head_sha=HEAD)
+    monkeypatch.setattr(diff_view, "DIFF_WINDOW_LINES", 20)
+    monkeypatch.setattr(diff_view, "INSIGHTS_FILES_PAGE", 2)
+    client = main.app.test_client()
+    # Viewing the page stores the analysis the fragments are rendered from
+    page = client.get("/insights/o/r/1")
+    assert page.status_code == 200
+    return client, page.get_data(as_text=True), load_analysis("o", "r", 1, HEAD)
+
+
+def test_diff_is_loaded_a_window_at_a_time(services, monkeypatch):
+    client, page, analysis = view_page(services, monkeypatch)
+    file = analysis.files[0]
+    total = len(file["lines"])
+    url = f"/insights/o/r/1/{HEAD}/diff?file={file['filename']}&start=0"
+
+    rows = 0
+    while url is not None:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == "private, max-age=86400"
+        fragment = response.get_data(as_text=True)
+        assert row_count(fragment) <= 20
+        rows += row_count(fragment)
+        url = more_url(fragment, "Show more lines")
+        if url is not None:
+            assert f"({total - rows} left)" in fragment
+    assert rows == total
+
+
+def test_file_list_is_paged(services, monkeypatch):
+    client, page, analysis = view_page(services, monkeypatch)
+
+    assert page.count('<div class="file-diff">') == 2
+    assert "Show more files (1 left)" in page
+    url = more_url(page, "Show more files")
+    assert url == f"/insights/o/r/1/{HEAD}/files?offset=2"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, max-age=86400"
+    fragment = response.get_data(as_text=True)
+    assert fragment.count('<div class="file-diff">') == 1
+    assert analysis.files[2]["filename"] in fragment
+    assert "Show more files" not in fragment
+
+
+def test_unknown_analyses_and_files_are_not_found(services, monkeypatch):
+    client, page, analysis = view_page(services, monkeypatch)
+    other_head = "b" * 40
+
+    response = client.get(f"/insights/o/r/1/{other_head}/files?offset=0")
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Analysis not found"}
+
+    filename = analysis.files[0]["filename"]
+    for url in (f"/insights/o/r/1/{other_head}/diff?file={filename}",
+                f"/insights/o/r/1/{HEAD}/diff?file=missing.py",
+                f"/insights/o/r/1/{HEAD}/diff"):
+        response = client.get(url)
+        assert response.status_code == 404, url
+        assert response.get_json() == {"error": "Diff not found"}
@@ -0,0 +1,39 @@
+import json
+
+import httpx
+import pytest
+
+from github_cache import DiskCache, ResponseCache
+
+
+def response(body, etag='"v1"'):
+    return httpx.Response(200, text=json.dumps(body), headers={
+        "ETag": etag,
+        "Link": '<https://api.github.com/repositories/1/pulls/1/files?page=2>; rel="next"',
+    }, request=httpx.Request("GET", "https://api.github.com/repos/o/r/pulls/1/files"))
+
+
+def test_disk_entries_survive_a_new_process(tmp_path):
+    cache = ResponseCache(1024 * 1024, directory=str(tmp_path))
+    key = ResponseCache.key("https://api.github.com/repos/o/r/pulls/1/files", {"page": 1})
+    cache.store(key, response([{"filename": "a.py"}]), [{"filename": "a.py"}])
+
+    entry = ResponseCache(1024 * 1024, directory=str(tmp_path)).get(key)
+    assert entry.data == [{"filename": "a.py"}]
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+    assert entry.links["next"]["url"].endswith("page=2")
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "{not json",
+    "[]",
+    "null",
+    '{"etag": "\\"v1\\""}',
+    '{"etag": null, "last_modified": null, "links": {}, "body": 3}',
+    '{"etag": null, "last_modified": null, "links": [], "body": "[]"}',
+])
+def test_malformed_disk_entries_are_misses(tmp_path, content):
+    cache = DiskCache(str(tmp_path), 1024 * 1024)
+    (tmp_path / "key.json").write_text(content, encoding="utf-8")
+    assert cache.get("key") is None
@@ -0,0 +1,41 @@
+import async_runtime
+import github_client
+from benchmarks.synthetic import many_files
+
+
+def file_list(number=1):
+    return async_runtime.run(github_client.get_pr_file_list_async("o", "r", number))
+
+
+def test_file_list_follows_the_link_header_across_pages(services):
+    pr_files = many_files(250, 2)
+    server, _ = services(pr_files)
+
+    files = file_list()
+
+    assert [file["filename"] for file in files] == [file["filename"] for file in pr_files]
+    # One request per page of PER_PAGE files
+    assert server.requests == 3
+
+
+def test_single_page_makes_one_request(services):
+    server, _ = services(many_files(github_client.PER_PAGE, 2))
+    assert len(file_list()) == github_client.PER_PAGE
+    assert server.requests == 1
+
+
+def test_pages_are_revalidated_with_their_links(services):
+    pr_files = many_files(250, 2)
+    server, _ = services(pr_files)
+    first = file_list()
+
+    # Every page comes back as a 304, and the cached Link header still leads to the later pages
+    second = file_list()
+    assert second == first
+    assert (server.requests, server.not_modified) == (6, 3)
+
+
+def test_callers_get_their_own_copy_of_cached_pages(services):
+    services(many_files(3, 2))
+    file_list()[0]["lines"] = "parsed"
+    assert "lines" not in file_list()[0]
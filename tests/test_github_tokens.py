@@ -0,0 +1,105 @@
+import time
+
+import httpx
+import pytest
+
+import async_runtime
+import github_client
+from benchmarks.fakes import FakeGitHubServer
+from github_tokens import TokenPool
+
+
+@pytest.fixture
+def github(monkeypatch):
+    """Starts a fake GitHub with per-token rate limits and points the client at it."""
+    servers = []
+
+    def start(tokens, rate_limit, window, max_wait=5.0):
+        server = FakeGitHubServer([], rate_limit=rate_limit, rate_limit_window=window).start()
+        servers.append(server)
+        pool = TokenPool(tokens, backoff_base=0.01, backoff_cap=0.05)
+        monkeypatch.setattr(github_client, "GITHUB_API_URL", server.url)
+        monkeypatch.setattr(github_client, "token_pool", pool)
+        monkeypatch.setattr(github_client, "GITHUB_RATE_LIMIT_MAX_WAIT", max_wait)
+        return server, pool
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def fetch_prs(numbers):
+    # Different PRs, so no request is answered from the cache or shared with another
+    async def fetch():
+        return [await github_client.get_pr_data_async("o", "r", number) for number in numbers]
+    return async_runtime.run(fetch())
+
+
+def test_requests_rotate_across_the_pool(github):
+    server, pool = github(["one", "two"], rate_limit=2, window=60)
+
+    prs = fetch_prs(range(1, 5))
+
+    assert [pr["number"] for pr in prs] == [1, 2, 3, 4]
+    # Four requests fit in two tokens' allowance without hitting a limit
+    assert server.rate_limited == 0
+    assert [state.remaining for state in pool.tokens] == [0, 0]
+
+
+def test_exhausted_pool_waits_for_the_reset(github):
+    server, _ = github(["one"], rate_limit=1, window=0.5)
+
+    started = time.perf_counter()
+    prs = fetch_prs([1, 2])
+
+    assert [pr["number"] for pr in prs] == [1, 2]
+    # The second request waited for the window to reset instead of failing
+    assert time.perf_counter() - started >= 0.3
+
+
+def test_rate_limit_error_once_the_wait_is_too_long(github):
+    github(["one"], rate_limit=1, window=60, max_wait=0.2)
+    fetch_prs([1])
+    with pytest.raises(github_client.RateLimitError):
+        fetch_prs([2])
+
+
+def test_penalize_honours_retry_after_then_backs_off_exponentially():
+    pool = TokenPool(["one"], backoff_base=1.0, backoff_cap=8.0)
+    state = pool.tokens[0]
+
+    assert pool.penalize(state, retry_after=30) == 30
+    assert state.available_at() >= time.time() + 29
+
+    delays = [pool.penalize(state) for _ in range(5)]
+    # Each ceiling doubles (2, 4, 8, 8, 8 after the first failure) and the delay lies in its upper half
+    for delay, ceiling in zip(delays, (4, 8, 8, 8, 8)):
+        assert ceiling / 2 <= delay <= ceiling
+    pool.succeeded(state)
+    assert state.failures == 0
+
+
+def test_server_errors_are_retried_and_rejected_tokens_dropped(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("Authorization"))
+        if request.headers.get("Authorization") == "token revoked":
+            return httpx.Response(401, json={"message": "Bad credentials"})
+        if len(seen) < 4:
+            return httpx.Response(502, json={"message": "Bad gateway"})
+        return httpx.Response(200, json={"number": 1})
+
+    pool = TokenPool(["revoked", "good"], backoff_base=0.001, backoff_cap=0.01)
+    # A token with an unknown count is assumed to have the most left, so it is tried first
+    pool.tokens[1].remaining = 100
+    monkeypatch.setattr(github_client, "token_pool", pool)
+    monkeypatch.setattr(github_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    response = async_runtime.run(github_client.send("https://api.github.test/repos/o/r/pulls/1"))
+
+    assert response.status_code == 200
+    assert seen == ["token revoked", "token good", "token good", "token good"]
+    assert pool.tokens[0].blocked_until == float("inf")
+    # The last usable token is never taken out of the pool
+    assert pool.disable(pool.tokens[1]) is False
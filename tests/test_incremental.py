@@ -0,0 +1,111 @@
+import time
+
+import async_runtime
+import jobs
+import main
+from analysis import analyze_pr
+from benchmarks.synthetic import make_file, many_files
+from instrumentation import RequestTimer, registry
+
+HEAD = "a" * 40
+NEW_HEAD = "b" * 40
+
+
+def wait_for(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.done:
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.02)
+    assert job.error is None, job.error
+
+
+def analyze(before=None):
+    return async_runtime.run(analyze_pr("o", "r", 1, RequestTimer(), summary=False, before=before))
+
+
+def counts():
+    return (registry.get("incremental_files_total", kind="reused"),
+            registry.get("incremental_files_total", kind="analyzed"))
+
+
+def push(server, pr_files, changed):
+    """Pushes a new head where the files at the `changed` indexes have new content."""
+    new_files = [dict(file) for file in pr_files]
+    for index in changed:
+        file = new_files[index]
+        new_files[index] = make_file(file["filename"], file["patch"] + "\n+changed_line = True")
+    return server.push(new_files, NEW_HEAD), new_files
+
+
+def reanalyze_counts(before):
+    reused, analyzed = counts()
+    analysis = analyze(before)
+    new_reused, new_analyzed = counts()
+    return analysis, new_reused - reused, new_analyzed - analyzed
+
+
+def test_push_reanalyzes_only_changed_files(services):
+    pr_files = many_files(20, 20)
+    server, openai = services([dict(file) for file in pr_files], head_sha=HEAD)
+    first = analyze()
+    first_calls = openai.calls
+
+    before, _ = push(server, pr_files, changed=[0, 1, 2])
+    analysis, reused, analyzed = reanalyze_counts(before)
+
+    assert (reused, analyzed) == (17, 3)
+    assert analysis.head_sha == NEW_HEAD
+    assert 0 < openai.calls - first_calls < first_calls
+    # Reused files keep their earlier scores
+    unchanged = pr_files[5]["filename"]
+    assert analysis.scores[unchanged] == first.scores[unchanged]
+
+
+def test_force_push_falls_back_to_blob_shas(services):
+    pr_files = many_files(20, 20)
+    server, _ = services([dict(file) for file in pr_files], head_sha=HEAD)
+    analyze()
+
+    before, _ = push(server, pr_files, changed=[0, 1, 2])
+    # After a force push the old head is gone, so the compare API has nothing to say
+    del server.snapshots[before]
+    _, reused, analyzed = reanalyze_counts(before)
+
+    assert (reused, analyzed) == (17, 3)
+
+
+def test_base_moved_patch_is_reanalyzed(services):
+    pr_files = many_files(20, 20)
+    server, _ = services([dict(file) for file in pr_files], head_sha=HEAD)
+    analyze()
+
+    # The base branch moved: the file's blob is unchanged, so compare does not list it,
+    # but its patch against the new base is different
+    new_files = [dict(file) for file in pr_files]
+    new_files[4]["patch"] = new_files[4]["patch"] + "\n context_from_new_base()"
+    before = server.push(new_files, NEW_HEAD)
+    _, reused, analyzed = reanalyze_counts(before)
+
+    assert (reused, analyzed) == (19, 1)
+
+
+def test_unchanged_head_is_served_from_the_store(services):
+    server, openai = services(many_files(5, 10), head_sha=HEAD)
+    first = analyze()
+    calls = openai.calls
+    assert analyze() is first
+    assert openai.calls == calls
+
+
+def test_job_after_push_reanalyzes_only_changed_files(services):
+    pr_files = many_files(20, 20)
+    server, _ = services([dict(file) for file in pr_files], head_sha=HEAD)
+    analyze()
+
+    push(server, pr_files, changed=[0, 1, 2])
+    reused, analyzed = counts()
+    job = jobs.submit(main.run_insights_job, "o", "r", 1)
+    wait_for(job)
+
+    assert counts() == (reused + 17, analyzed + 3)
+    assert {"header", "files"} <= set(job.changes_since(0))
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+import time
+
+import jobs
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_running_jobs_are_not_evicted(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETENTION", 2)
+    release = threading.Event()
+
+    async def slow(job, owner, repo, pr_number):
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+
+    async def quick(job, owner, repo, pr_number):
+        job.publish("files", "done")
+
+    running = jobs.submit(slow, "o", "r", 1)
+    quick_jobs = [jobs.submit(quick, "o", "r", number) for number in range(2, 7)]
+    wait_until(lambda: all(job.done for job in quick_jobs))
+
+    # Only the newest finished jobs are kept, but the running one is still there to poll
+    assert jobs.get_job(running.id) is running
+    assert [jobs.get_job(job.id) for job in quick_jobs[:3]] == [None, None, None]
+    assert all(jobs.get_job(job.id) is job for job in quick_jobs[3:])
+
+    release.set()
+    # Once finished it counts against the retention like any other, as the newest finished job
+    wait_until(lambda: jobs.get_job(quick_jobs[3].id) is None)
+    assert jobs.get_job(running.id) is running
+    assert jobs.get_job(quick_jobs[4].id) is quick_jobs[4]
@@ -0,0 +1,40 @@
+import analysis
+import main
+import store
+from benchmarks.synthetic import many_files
+
+
+def view(client, path):
+    response = client.get(path)
+    # Reads the whole page, including a streamed summary
+    response.get_data()
+    assert response.status_code == 200
+
+
+def forget_analyses(monkeypatch):
+    """Drops stored analyses, so the next view can only be served from the model cache."""
+    monkeypatch.setattr(analysis, "analysis_store", store.MemoryStore())
+    monkeypatch.setattr(analysis, "recent_analyses", store.MemoryStore())
+
+
+def test_second_view_makes_no_model_calls(services, monkeypatch):
+    _, openai = services(many_files(8, 20))
+    client = main.app.test_client()
+    view(client, "/insights/o/r/1")
+    calls = openai.calls
+    assert calls > 0
+
+    forget_analyses(monkeypatch)
+    view(client, "/insights/o/r/1")
+    assert openai.calls == calls
+
+
+def test_identical_patch_in_another_pr_makes_no_model_calls(services):
+    _, openai = services(many_files(8, 20))
+    client = main.app.test_client()
+    view(client, "/insights/o/r/1")
+    calls = openai.calls
+
+    view(client, "/insights/o/r/2")
+    view(client, "/insights/other/fork/1")
+    assert openai.calls == calls
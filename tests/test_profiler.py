@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+
+import async_runtime
+import instrumentation
+
+
+def spin_a(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def spin_b(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def profiled_request(loop, spin, profiles):
+    profiler = instrumentation.SamplingProfiler().start()
+    try:
+        async def on_loop():
+            spin(0.2)
+            await async_runtime.run_cpu(spin, 0.2)
+
+        asyncio.run_coroutine_threadsafe(on_loop(), loop).result()
+        spin(0.2)
+    finally:
+        profiler.stop()
+    profiles[spin.__name__] = profiler.samples
+
+
+def stacks_with(samples, *names):
+    return [stack for stack in samples if all(name in stack for name in names)]
+
+
+def test_profiles_only_sample_their_own_requests_work():
+    loop = asyncio.new_event_loop()
+    loop.set_task_factory(instrumentation.profiled_task_factory)
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+    profiles = {}
+    try:
+        requests = [threading.Thread(target=profiled_request, args=(loop, spin, profiles)) for spin in (spin_a, spin_b)]
+        for request in requests:
+            request.start()
+        for request in requests:
+            request.join(30)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join(5)
+
+    for own, other in (("spin_a", "spin_b"), ("spin_b", "spin_a")):
+        samples = profiles[own]
+        # The request thread, its coroutine on the event loop and its executor call are all sampled
+        assert stacks_with(samples, "profiled_request", own)
+        assert stacks_with(samples, "on_loop", own)
+        assert stacks_with(samples, "instrumentation.py:call", own)
+        # The other request's work is not
+        assert not stacks_with(samples, other)
+    # Nothing stays attributed once the requests are done
+    assert not instrumentation._thread_profiles
@@ -0,0 +1,31 @@
+import ai
+import async_runtime
+from benchmarks.fakes import FakeOpenAI
+from benchmarks.synthetic import many_files
+from llm_cache import create_cache
+
+
+class MalformedOnceOpenAI(FakeOpenAI):
+    """Replies to the first scores prompt with a list of bare strings, then behaves."""
+
+    def __init__(self):
+        super().__init__()
+        self.malformed = False
+
+    def reply(self, prompt):
+        if not self.malformed:
+            self.malformed = True
+            return '{"files": ["src/app.py", 3, null]}'
+        return super().reply(prompt)
+
+
+def test_malformed_scores_reply_is_retried(monkeypatch):
+    openai = MalformedOnceOpenAI()
+    monkeypatch.setattr(ai, "client", openai)
+    monkeypatch.setattr(ai, "llm_cache", create_cache("memory"))
+    pr_files = many_files(4, 10)
+
+    scores = async_runtime.run(ai.get_scores_async(pr_files))
+
+    assert sorted(file["filename"] for file in scores["files"]) == sorted(file["filename"] for file in pr_files)
+    assert openai.calls > 1
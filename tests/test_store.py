@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+
+import async_runtime
+import store
+from analysis import analyze_pr
+from benchmarks.synthetic import many_files
+from instrumentation import RequestTimer
+
+HEAD = "a" * 40
+
+
+def analyzed(services):
+    pr_files = many_files(6, 30)
+    # A deleted binary file has no patch
+    pr_files.append({"filename": "assets/logo.png", "status": "removed", "additions": 0, "deletions": 0,
+                     "changes": 0, "sha": "f" * 40})
+    services(pr_files, head_sha=HEAD)
+    return async_runtime.run(analyze_pr("o", "r", 1, RequestTimer()))
+
+
+def assert_same(loaded, analysis):
+    assert loaded.key == analysis.key
+    assert loaded.pr_data["title"] == analysis.pr_data["title"]
+    assert loaded.pr_data["head"]["sha"] == HEAD
+    assert loaded.repo_data["owner"]["login"] == analysis.repo_data["owner"]["login"]
+    assert loaded.scores == analysis.scores
+    assert loaded.suggestions == analysis.suggestions
+    assert loaded.summary == analysis.summary
+    assert loaded.created == analysis.created
+    assert [file["filename"] for file in loaded.files] == [file["filename"] for file in analysis.files]
+    for loaded_file, file in zip(loaded.files, analysis.files):
+        for field in ("status", "sha", "patch", "is_vulnerable", "importance_score", "vulnerability_summary",
+                      "triage"):
+            assert loaded_file.get(field) == file.get(field), field
+        if file.get("lines") is None:
+            assert loaded_file.get("lines") is None
+        else:
+            assert [line.to_dict() for line in loaded_file["lines"]] == [line.to_dict() for line in file["lines"]]
+
+
+def test_serialize_round_trip(services):
+    analysis = analyzed(services)
+    loaded = store.deserialize("o", "r", "1", HEAD, store.serialize(analysis))
+    assert_same(loaded, analysis)
+
+
+def test_deserialize_ignores_other_formats(services, monkeypatch):
+    data = store.serialize(analyzed(services))
+    monkeypatch.setattr(store, "FORMAT_VERSION", store.FORMAT_VERSION + 1)
+    assert store.deserialize("o", "r", 1, HEAD, data) is None
+
+
+def test_sqlite_store_round_trip(services, tmp_path):
+    analysis = analyzed(services)
+    # A low threshold so the record is stored compressed
+    sqlite_store = store.SQLiteStore(str(tmp_path / "analyses.sqlite3"), compress_min_bytes=100)
+    sqlite_store.put(analysis)
+    assert_same(sqlite_store.get("o", "r", "1", HEAD), analysis)
+    assert_same(sqlite_store.latest("o", "r", 1), analysis)
+    assert sqlite_store.get("o", "r", 1, "b" * 40) is None
+
+
+def test_stored_head_is_served_without_the_file_list(services):
+    server, _ = services(many_files(250, 5), head_sha=HEAD)
+    analysis = async_runtime.run(analyze_pr("o", "r", 1, RequestTimer(), summary=False))
+    requests = server.requests
+
+    assert async_runtime.run(analyze_pr("o", "r", 1, RequestTimer(), summary=False)) is analysis
+    # Only the PR itself, to learn its head; not the repository or the three pages of files
+    assert server.requests - requests == 1
+
+
+def test_sqlite_store_limits_access_time_writes(services, tmp_path):
+    analysis = analyzed(services)
+    sqlite_store = store.SQLiteStore(str(tmp_path / "analyses.sqlite3"), touch_interval=300)
+    sqlite_store.put(analysis)
+
+    def accessed_at():
+        return sqlite_store._connect().execute("SELECT accessed_at FROM analyses").fetchone()[0]
+
+    stored_at = accessed_at()
+    sqlite_store.get("o", "r", 1, HEAD)
+    assert accessed_at() == stored_at
+
+    sqlite_store.touch_interval = 0
+    sqlite_store.get("o", "r", 1, HEAD)
+    assert accessed_at() > stored_at
+
+
+def test_sqlite_store_opens_its_file_on_first_use(tmp_path):
+    path = tmp_path / "analyses.sqlite3"
+    sqlite_store = store.SQLiteStore(str(path))
+    assert not path.exists()
+    assert sqlite_store.get("o", "r", 1, HEAD) is None
+    assert path.exists()
+
+
+def test_importing_the_app_creates_no_database(tmp_path):
+    env = dict(os.environ, OPENAI_API_KEY="test", ANALYSIS_STORE_BACKEND="sqlite",
+               PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env.pop("ANALYSIS_STORE_PATH", None)
+    subprocess.run([sys.executable, "-c", "import main, wsgi"], cwd=tmp_path, env=env, check=True)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,65 @@
+import json
+
+import ai
+import main
+from ai import render_summary
+from benchmarks.fakes import FakeOpenAI
+from benchmarks.synthetic import many_files
+
+SUMMARY = "### Summary\nThis synthetic PR refactors **handlers** across modules."
+
+
+class FailingOpenAI(FakeOpenAI):
+    async def create(self, model, messages, **params):
+        raise RuntimeError("model unavailable")
+
+
+def read_events(response):
+    """The (event, data) pairs of a Server-Sent Events response."""
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if block:
+            fields = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_summary_streams_progressively_then_done(services):
+    server, openai = services(many_files(5, 10))
+    client = main.app.test_client()
+
+    response = client.get("/insights/o/r/1/summary")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    events = read_events(response)
+    assert [name for name, _ in events[-1:]] == ["done"]
+    summaries = [data["html"] for name, data in events if name == "summary"]
+    # The heading's line break is rendered as soon as it arrives, ahead of the rest
+    assert len(summaries) > 1
+    # Each event renders more of the summary, ending with the whole of it
+    assert all(len(earlier) <= len(later) for earlier, later in zip(summaries, summaries[1:]))
+    assert summaries[-1] == render_summary(SUMMARY)
+
+
+def test_cached_summary_is_sent_whole(services):
+    server, openai = services(many_files(5, 10))
+    client = main.app.test_client()
+    client.get("/insights/o/r/1/summary")
+    calls = openai.calls
+
+    events = read_events(client.get("/insights/o/r/1/summary"))
+
+    assert events == [("summary", {"html": render_summary(SUMMARY)}), ("done", {})]
+    assert openai.calls == calls
+
+
+def test_failed_summary_is_reported_before_done(services, monkeypatch):
+    services(many_files(5, 10))
+    monkeypatch.setattr(ai, "client", FailingOpenAI())
+    client = main.app.test_client()
+
+    events = read_events(client.get("/insights/o/r/1/summary"))
+
+    assert events == [("failed", {"error": "Summary unavailable"}), ("done", {})]
@@ -0,0 +1,61 @@
+from triage import build_rules, triage_files
+
+
+def make_file(filename, patch):
+    return {"filename": filename, "patch": patch}
+
+
+def new_file_patch(*lines):
+    return f"@@ -0,0 +1,{len(lines)} @@\n" + "\n".join("+" + line for line in lines)
+
+
+def modified_patch(*lines):
+    return f"@@ -10,3 +10,{len(lines) + 3} @@\n def login(user):\n" + "\n".join("+" + line for line in lines)
+
+
+def triaged(file):
+    scores, remaining, _ = triage_files([file], build_rules())
+    return scores[0] if scores else None
+
+
+def test_marker_in_new_generated_file_is_triaged():
+    score = triaged(make_file("api/client.py", new_file_patch("# Code generated by openapi. DO NOT EDIT.", "x = 1")))
+    assert score["triage"] == "generated"
+
+
+def test_marker_added_to_existing_file_is_not_triaged():
+    file = make_file("app/auth.py", modified_patch("# DO NOT EDIT without security review", "token = request.args['t']"))
+    assert triaged(file) is None
+
+
+def test_marker_in_new_file_starting_below_line_one_is_not_triaged():
+    file = make_file("app/auth.py", "@@ -0,0 +5,2 @@\n+# @generated\n+x = 1")
+    assert triaged(file) is None
+
+
+def test_long_line_in_source_file_is_not_triaged():
+    file = make_file("app/sql.py", modified_patch("query = '" + "a" * 2000 + "'"))
+    assert triaged(file) is None
+
+
+def test_long_line_in_javascript_is_triaged_as_minified():
+    score = triaged(make_file("static/app.js", modified_patch("var a=" + "1," * 1000 + "0;")))
+    assert score["triage"] == "minified"
+
+
+def test_build_directories_only_match_at_repository_root():
+    assert triaged(make_file("tools/build/release.py", modified_patch("run()"))) is None
+    assert triaged(make_file("build/release.py", modified_patch("run()")))["triage"] == "generated"
+
+
+def test_triaged_files_are_not_claimed_secure():
+    score = triaged(make_file("poetry.lock", modified_patch('version = "1.0"')))
+    assert score["triage"] == "lockfile"
+    assert score["status"] == "unknown"
+    assert score["status"] != "secure"
+
+
+def test_keep_patterns_always_go_to_the_model():
+    rules = build_rules({"keep": ["poetry.lock"]})
+    scores, remaining, _ = triage_files([make_file("poetry.lock", modified_patch("x"))], rules)
+    assert scores == [] and len(remaining) == 1
@@ -0,0 +1,72 @@
+import time
+
+import analysis
+import jobs
+import main
+import webhooks
+from benchmarks.fakes import pull_request_payload, webhook_request
+from benchmarks.synthetic import many_files
+
+SECRET = "webhook-secret"
+
+
+def test_verify_signature_accepts_the_senders_signature():
+    body, headers = webhook_request({"action": "opened"}, SECRET)
+    assert webhooks.verify_signature(SECRET, body, headers["X-Hub-Signature-256"])
+
+
+def test_verify_signature_rejects_bad_signatures():
+    body, headers = webhook_request({"action": "opened"}, SECRET)
+    signature = headers["X-Hub-Signature-256"]
+    assert not webhooks.verify_signature("other-secret", body, signature)
+    assert not webhooks.verify_signature(SECRET, body + b" ", signature)
+    assert not webhooks.verify_signature(SECRET, body, signature[len("sha256="):])
+    assert not webhooks.verify_signature(SECRET, body, None)
+    assert not webhooks.verify_signature(None, body, signature)
+
+
+def test_pull_request_target_for_analyzed_actions():
+    opened = pull_request_payload("octo", "app", 7, "opened", "a" * 40)
+    assert webhooks.pull_request_target("pull_request", opened) == ("octo", "app", 7, None)
+
+    pushed = pull_request_payload("octo", "app", 7, "synchronize", "b" * 40, before="a" * 40)
+    assert webhooks.pull_request_target("pull_request", pushed) == ("octo", "app", 7, "a" * 40)
+
+
+def test_pull_request_target_ignores_other_deliveries():
+    closed = pull_request_payload("octo", "app", 7, "closed", "a" * 40)
+    assert webhooks.pull_request_target("pull_request", closed) is None
+    opened = pull_request_payload("octo", "app", 7, "opened", "a" * 40)
+    assert webhooks.pull_request_target("push", opened) is None
+    assert webhooks.pull_request_target("pull_request", {"action": "opened", "pull_request": {}}) is None
+
+
+def test_webhook_endpoint_precomputes_the_analysis(services, monkeypatch):
+    server, openai = services(many_files(5, 10), head_sha="a" * 40)
+    monkeypatch.setattr(webhooks, "GITHUB_WEBHOOK_SECRET", SECRET)
+    client = main.app.test_client()
+
+    body, headers = webhook_request(pull_request_payload("o", "r", 1, "opened", "a" * 40), SECRET)
+    response = client.post("/webhooks/github", data=body, headers=headers)
+    assert response.status_code == 202
+    job = jobs.get_job(response.get_json()["job_id"])
+    deadline = time.time() + 30
+    while not job.done:
+        assert time.time() < deadline
+        time.sleep(0.02)
+    assert job.error is None
+    assert analysis.analysis_store.get("o", "r", 1, "a" * 40) is not None
+    # The job id handed back to GitHub leads to a working job page
+    assert client.get(f"/jobs/{job.id}").status_code == 200
+    assert client.get(f"/jobs/{job.id}/status").get_json()["done"]
+
+    # Opening the page afterwards is served from the store without the model
+    calls = openai.calls
+    assert client.get("/insights/o/r/1").status_code == 200
+    assert openai.calls == calls
+
+
+def test_webhook_endpoint_rejects_unsigned_deliveries(monkeypatch):
+    monkeypatch.setattr(webhooks, "GITHUB_WEBHOOK_SECRET", SECRET)
+    body, headers = webhook_request(pull_request_payload("o", "r", 1, "opened", "a" * 40), "wrong")
+    assert main.app.test_client().post("/webhooks/github", data=body, headers=headers).status_code == 401
@@ -0,0 +1,253 @@
+from fnmatch import fnmatchcase
+import json
+import os
+import posixpath
+import re
+
+from dotenv import load_dotenv
+
+from ai import estimate_tokens
+
+load_dotenv()
+
+# JSON file of per-repository rule overrides (see load_config)
+TRIAGE_CONFIG = os.getenv("TRIAGE_CONFIG")
+# An added line this long means the file is minified or bundled
+TRIAGE_MINIFIED_LINE_LENGTH = int(os.getenv("TRIAGE_MINIFIED_LINE_LENGTH", "1000"))
+# Data files (JSON, CSV, SVG, ...) are only triaged when their patch is at least this many tokens
+TRIAGE_DATA_MIN_TOKENS = int(os.getenv("TRIAGE_DATA_MIN_TOKENS", "2000"))
+
+# Generated files announce themselves near the top, e.g. "Code generated by protoc. DO NOT EDIT."
+_PATTERN_GENERATED_MARKER = re.compile(
+    r"@generated|DO NOT EDIT|auto-?generated (?:file|code)|(?:code|file) (?:is )?generated by", re.IGNORECASE)
+# Added lines inspected for a generated-file marker
+GENERATED_MARKER_LINES = 20
+# A patch creating a file starts with this hunk header
+_PATTERN_NEW_FILE_HUNK = re.compile(r"^@@ -0,0 \+1(?:,\d+)? @@")
+# Only these files are judged minified by their line length; a long line in source code is still reviewed
+MINIFIED_EXTENSIONS = (".js", ".mjs", ".cjs", ".css", ".map", ".json", ".svg", ".csv", ".tsv", ".geojson",
+                       ".ndjson")
+
+
+def _matches(filename, patterns):
+    # Patterns without a slash match the file name anywhere, like in .gitignore
+    basename = posixpath.basename(filename)
+    return any(fnmatchcase(filename if "/" in pattern else basename, pattern) for pattern in patterns)
+
+
+def _added_lines(patch):
+    for line in patch.split("\n"):
+        if line.startswith("+") and not line.startswith("+++"):
+            yield line[1:]
+
+
+class TriageRule:
+    """
+    Base class for a check that recognizes a kind of file not worth sending to the model.
+
+    A file matches when its path matches one of the patterns or, for rules
+    that look at content, when matches_content() recognizes its diff. Matched
+    files get `score` without an LLM call, and so are not scanned for
+    vulnerabilities.
+    """
+
+    category = None
+    score = 1
+    patterns = ()
+
+    def __init__(self, patterns=None, score=None):
+        self.patterns = tuple(self.patterns if patterns is None else patterns)
+        if score is not None:
+            self.score = score
+
+    def matches(self, file):
+        return _matches(file["filename"], self.patterns) or self.matches_content(file)
+
+    def matches_content(self, file):
+        return False
+
+
+class LockfileRule(TriageRule):
+    category = "lockfile"
+    patterns = (
+        "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+        "Pipfile.lock", "poetry.lock", "uv.lock", "Cargo.lock", "Gemfile.lock", "composer.lock",
+        "go.sum", "mix.lock", "Podfile.lock", "packages.lock.json", "gradle.lockfile", "flake.lock",
+    )
+
+
+class VendoredRule(TriageRule):
+    category = "vendored"
+    patterns = (
+        "vendor/*", "*/vendor/*", "third_party/*", "*/third_party/*", "third-party/*", "*/third-party/*",
+        "node_modules/*", "*/node_modules/*", "bower_components/*", "*/bower_components/*",
+    )
+
+
+class GeneratedRule(TriageRule):
+    category = "generated"
+    patterns = (
+        "*_pb2.py", "*_pb2_grpc.py", "*_pb2.pyi", "*.pb.go", "*_grpc.pb.go", "*.pb.cc", "*.pb.h",
+        "*.generated.*", "*_generated.*", "*.g.dart", "*.freezed.dart", "*.designer.cs",
+        # Build output at the repository root only; e.g. tools/build/ is usually source
+        "dist/*", "build/*",
+    )
+
+    def matches_content(self, file):
+        # Only a new file's own header counts; a marker comment added to an existing file proves nothing
+        patch = file["patch"]
+        if not _PATTERN_NEW_FILE_HUNK.match(patch):
+            return False
+        for index, line in enumerate(_added_lines(patch)):
+            if index >= GENERATED_MARKER_LINES:
+                return False
+            if _PATTERN_GENERATED_MARKER.search(line):
+                return True
+        return False
+
+
+class MinifiedRule(TriageRule):
+    category = "minified"
+    patterns = ("*.min.js", "*.min.css", "*.min.mjs", "*.bundle.js", "*.js.map", "*.css.map")
+
+    def matches_content(self, file):
+        if not file["filename"].lower().endswith(MINIFIED_EXTENSIONS):
+            return False
+        return any(len(line) >= TRIAGE_MINIFIED_LINE_LENGTH for line in _added_lines(file["patch"]))
+
+
+class SnapshotRule(TriageRule):
+    category = "snapshot"
+    score = 2
+    patterns = ("*.snap", "*.ambr", "__snapshots__/*", "*/__snapshots__/*", "*.approved.*", "*.received.*")
+
+
+class DataRule(TriageRule):
+    # Only large data diffs: a small change to a JSON config can matter
+    category = "data"
+    data_patterns = ("*.json", "*.csv", "*.tsv", "*.svg", "*.geojson", "*.ndjson")
+
+    def matches(self, file):
+        return (_matches(file["filename"], self.patterns + self.data_patterns)
+                and estimate_tokens(file["patch"]) >= TRIAGE_DATA_MIN_TOKENS)
+
+
+# Rules tried, in order, on every file
+TRIAGE_RULES = [LockfileRule, VendoredRule, GeneratedRule, MinifiedRule, SnapshotRule, DataRule]
+
+
+class TriageRules:
+    def __init__(self, rules, keep=()):
+        """
+        The triage rules that apply to one repository.
+
+        Parameters:
+            rules (list): TriageRule instances, tried in order.
+            keep (tuple): Patterns of files that always go to the model.
+        """
+        self.rules = rules
+        self.keep = tuple(keep)
+
+    def classify(self, file):
+        """
+        Returns:
+            TriageRule or None: The first rule matching the file, or None if it needs the model.
+        """
+        if "patch" not in file or _matches(file["filename"], self.keep):
+            return None
+        for rule in self.rules:
+            if rule.matches(file):
+                return rule
+        return None
+
+
+def build_rules(options=None):
+    """
+    Builds the rules for a repository from its configuration.
+
+    Parameters:
+        options (dict): Overrides, all optional:
+            {"<category>": [extra patterns], "scores": {"<category>": score},
+             "disable": ["<category>", ...], "keep": [patterns never triaged]}
+
+    Returns:
+        TriageRules
+    """
+    options = options or {}
+    disabled = set(options.get("disable", ()))
+    scores = options.get("scores", {})
+    rules = []
+    for rule_class in TRIAGE_RULES:
+        if rule_class.category in disabled:
+            continue
+        patterns = rule_class.patterns + tuple(options.get(rule_class.category, ()))
+        rules.append(rule_class(patterns, scores.get(rule_class.category)))
+    return TriageRules(rules, options.get("keep", ()))
+
+
+def load_config(path=TRIAGE_CONFIG):
+    """
+    Reads per-repository overrides.
+
+    The file maps "owner/repo" to options for build_rules(); a "*" entry
+    applies to every repository, with a repository's own entry layered on top.
+    """
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_config = load_config()
+_rules = {}
+
+
+def rules_for(owner=None, repo=None):
+    """The triage rules configured for a repository, built once per repository."""
+    key = f"{owner}/{repo}" if owner and repo else "*"
+    rules = _rules.get(key)
+    if rules is None:
+        options = dict(_config.get("*", {}))
+        repo_options = _config.get(key, {}) if key != "*" else {}
+        for name, value in repo_options.items():
+            # Pattern lists add up; anything else is replaced
+            if isinstance(value, list) and isinstance(options.get(name), list):
+                value = options[name] + value
+            options[name] = value
+        rules = _rules[key] = build_rules(options)
+    return rules
+
+
+def triage_files(pr_files, rules=None):
+    """
+    Scores the obvious files locally so only the rest are sent to the model.
+
+    Parameters:
+        pr_files (list): Files with patches.
+        rules (TriageRules): Defaults to the rules shared by every repository.
+
+    Returns:
+        tuple: (scores, remaining, tokens_saved), where scores are score dicts
+            shaped like the model's, remaining are the files still to score,
+            and tokens_saved estimates the prompt tokens not sent as {category: tokens}.
+            Triaged files get the status "unknown": they were not scanned for
+            vulnerabilities, so they are not claimed to be secure.
+    """
+    rules = rules_for() if rules is None else rules
+    scores = []
+    remaining = []
+    tokens_saved = {}
+    for file in pr_files:
+        rule = rules.classify(file)
+        if rule is None:
+            remaining.append(file)
+            continue
+        scores.append({
+            "filename": file["filename"],
+            "status": "unknown",
+            "importance_score": rule.score,
+            "vulnerability_summary": None,
+            "triage": rule.category,
+        })
+        tokens_saved[rule.category] = tokens_saved.get(rule.category, 0) + estimate_tokens(file["patch"])
+    return scores, remaining, tokens_saved
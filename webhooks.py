@@ -0,0 +1,53 @@
+import hashlib
+import hmac
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Shared secret configured on the GitHub webhook; deliveries are refused without it
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+
+# pull_request actions after which the PR has something new to analyze
+ANALYZED_ACTIONS = ("opened", "reopened", "synchronize")
+
+
+def verify_signature(secret, body, signature):
+    """
+    Checks the `X-Hub-Signature-256` header GitHub sends with each delivery.
+
+    Parameters:
+        secret (str): The webhook secret.
+        body (bytes): The raw request body.
+        signature (str): The header value, "sha256=<hex HMAC of the body>".
+
+    Returns:
+        bool: Whether the delivery was signed with the secret.
+    """
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def pull_request_target(event, payload):
+    """
+    Picks out the PR to analyze from a webhook delivery.
+
+    Returns:
+        tuple or None: (owner, repo, pr_number, before), where before is the
+            previous head SHA on a push and None otherwise; None if the
+            delivery needs no analysis.
+    """
+    if event != "pull_request" or payload.get("action") not in ANALYZED_ACTIONS:
+        return None
+    pull_request = payload.get("pull_request") or {}
+    repository = payload.get("repository") or {}
+    owner = (repository.get("owner") or {}).get("login")
+    repo = repository.get("name")
+    pr_number = pull_request.get("number") or payload.get("number")
+    if not (owner and repo and pr_number):
+        return None
+    before = payload.get("before") if payload.get("action") == "synchronize" else None
+    return owner, repo, int(pr_number), before